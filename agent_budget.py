@@ -0,0 +1,157 @@
+import contextvars
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from cache import normalize_query
+from context import estimate_tokens
+from tracing import annotate, metrics
+
+# -----------------------------
+# Settings
+# -----------------------------
+MAX_STEPS = int(os.getenv("QAI_AGENT_MAX_STEPS", "6"))  # model turns that call tools
+MAX_TOKENS = int(os.getenv("QAI_AGENT_MAX_TOKENS", "24000"))  # prompt + completion, all model calls
+DEADLINE = float(os.getenv("QAI_AGENT_DEADLINE", "60"))  # seconds before the answer is forced
+NEAR_DUPLICATE = 0.8  # word-set Jaccard above which two tool queries count as the same
+
+FINAL_INSTRUCTION = (
+    "The research budget for this query is used up ({reason}). Do not call any more tools. "
+    "Using only the evidence above, reply now with the final JSON answer in the required schema."
+)
+
+_WORD = re.compile(r"\w+")
+
+_lock = threading.Lock()
+counts = {"forced_steps": 0, "forced_tokens": 0, "forced_deadline": 0, "duplicate_calls": 0}
+
+metrics.gauges["qai_agent_budget_total"] = lambda: {f'event="{k}"': v for k, v in counts.items()}
+
+
+def _count(key: str):
+    with _lock:
+        counts[key] += 1
+
+
+# -----------------------------
+# Per-query controller
+# -----------------------------
+class AgentBudget:
+    """Step, token and time limits for one research query, plus the tool calls made so far."""
+
+    def __init__(self, steps: int = MAX_STEPS, tokens: int = MAX_TOKENS, deadline: float = DEADLINE):
+        self.steps = steps
+        self.tokens = tokens
+        self.deadline = time.monotonic() + deadline
+        self.forced = None  # reason the final answer was forced, if it was
+        self._calls = []  # (tool, normalized query, word set)
+        self._lock = threading.Lock()
+
+    def repeated(self, tool: str, query: str) -> str | None:
+        """The earlier query if this tool call repeats one; otherwise record it and return None."""
+        normalized = normalize_query(query)
+        words = set(_WORD.findall(normalized))
+        with self._lock:
+            for name, previous, seen in self._calls:
+                if name != tool:
+                    continue
+                overlap = len(words & seen) / (len(words | seen) or 1)
+                if previous == normalized or overlap >= NEAR_DUPLICATE:
+                    _count("duplicate_calls")
+                    return previous
+            self._calls.append((tool, normalized, words))
+        return None
+
+    def forget(self, tool: str, query: str):
+        """Drop a recorded call that failed, so trying it again isn't a repeat."""
+        normalized = normalize_query(query)
+        with self._lock:
+            self._calls = [c for c in self._calls if (c[0], c[1]) != (tool, normalized)]
+
+    def exhausted(self, messages) -> str | None:
+        """Why no more tool rounds are allowed for this query, or None."""
+        steps, tokens = usage(messages)
+        annotate(agent_steps=steps, agent_tokens=tokens)
+        if steps >= self.steps:
+            return "steps"
+        if tokens >= self.tokens:
+            return "tokens"
+        if time.monotonic() >= self.deadline:
+            return "deadline"
+        return None
+
+
+def usage(messages) -> tuple[int, int]:
+    """Tool-calling model turns and tokens spent since the current question."""
+    start = max((i for i, m in enumerate(messages) if m.type == "human"), default=0)
+    steps = tokens = 0
+    context = sum(estimate_tokens(str(m.content)) for m in messages[:start + 1])
+    for msg in messages[start + 1:]:
+        size = estimate_tokens(str(msg.content))
+        if msg.type == "ai":
+            steps += bool(msg.tool_calls)
+            reported = (msg.usage_metadata or {}).get("total_tokens")
+            tokens += reported if reported else context + size
+        context += size
+    return steps, tokens
+
+
+_active = contextvars.ContextVar("qai_agent_budget", default=None)
+
+
+@contextmanager
+def agent_budget(**limits):
+    """Apply one AgentBudget to the research agent run inside this block."""
+    budget = AgentBudget(**limits)
+    token = _active.set(budget)
+    try:
+        yield budget
+    finally:
+        if budget.forced:
+            annotate(agent_forced=budget.forced)
+        try:
+            _active.reset(token)
+        except ValueError:
+            _active.set(None)
+
+
+def repeated(tool: str, query: str) -> str | None:
+    budget = _active.get()
+    return budget.repeated(tool, query) if budget is not None else None
+
+
+def forget(tool: str, query: str):
+    budget = _active.get()
+    if budget is not None:
+        budget.forget(tool, query)
+
+
+# -----------------------------
+# Agent model selection
+# -----------------------------
+def budgeted_model(model, tools):
+    """Model callable for create_react_agent that forces a final answer once the budget is spent.
+
+    While there is budget left the model gets the tools as usual. After
+    that it gets them with tool_choice="none" and an instruction to answer
+    from the evidence so far, so the loop ends on its next turn.
+    """
+    from langchain_core.messages import HumanMessage
+
+    with_tools = model.bind_tools(tools)
+    answer_only = model.bind_tools(tools, tool_choice="none")
+
+    def select(state, runtime):
+        budget = _active.get()
+        reason = budget.exhausted(state["messages"]) if budget is not None else None
+        if reason is None:
+            return with_tools
+
+        if budget.forced is None:
+            budget.forced = reason
+            _count(f"forced_{reason}")
+        note = HumanMessage(FINAL_INSTRUCTION.format(reason=reason))
+        return (lambda messages: [*messages, note]) | answer_only
+
+    return select
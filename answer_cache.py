@@ -0,0 +1,188 @@
+"""Semantic cache of finished answers.
+
+Check which query pairs count as the same question:
+    python answer_cache.py eval benchmarks/answer_cache_pairs.tsv
+"""
+import hashlib
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# -----------------------------
+# Settings
+# -----------------------------
+SIMILARITY_THRESHOLD = float(os.getenv("QAI_ANSWER_SIMILARITY", "0.9"))
+ANSWER_CACHE_SIZE = int(os.getenv("QAI_ANSWER_CACHE_SIZE", "1000"))
+ANSWER_TTL = int(os.getenv("QAI_ANSWER_TTL", "3600"))
+
+DIMENSIONS = 2 ** 18
+
+
+def _bucket(feature: str) -> int:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % DIMENSIONS
+
+
+def embed(text: str) -> dict[int, float]:
+    """Hashed word + character-trigram vector, L2-normalized and sparse."""
+    words = re.findall(r"\w+", text.lower())
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    vector = {}
+    for feature in features:
+        b = _bucket(feature)
+        vector[b] = vector.get(b, 0.0) + 1.0
+
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+# Words that don't change what is being asked. Negations, numbers and every
+# other word do: two queries only share an answer if those match exactly.
+STOPWORDS = frozenset("""
+a an the of in on at to for from by with about into and or is are was were be been
+what who whom which when where why how do does did can could would should will
+me my i you your we our us please tell explain describe give show find research
+look up some any this that these those it its there s
+""".split())
+
+
+def content_words(text: str) -> frozenset[str]:
+    """Words that carry meaning, with a plural "s" dropped so "cause" matches "causes"."""
+    words = re.findall(r"\w+", text.lower())
+    return frozenset(
+        w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+        for w in words if w not in STOPWORDS
+    )
+
+
+def cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+# -----------------------------
+# Semantic answer cache
+# -----------------------------
+class AnswerCache:
+    """Returns a stored answer when a new query is close enough to an old one.
+
+    Entries are grouped by mode ("chat" / "research") and indexed by their
+    hashed features, so a lookup only scores entries sharing a feature.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = ANSWER_CACHE_SIZE, ttl: int = ANSWER_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # id -> (mode, vector, answer, stored_at, content words)
+        self._index = {}  # (mode, bucket) -> set of ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _drop(self, entry_id):
+        mode, vector, _, _, _ = self._entries.pop(entry_id)
+        for b in vector:
+            ids = self._index.get((mode, b))
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._index[(mode, b)]
+
+    def lookup(self, mode: str, query: str, margin: float = 0.0, count: bool = True):
+        """Return (answer, similarity) for the best match above threshold, else (None, score).
+
+        A match must also have the same content words (see STOPWORDS), so
+        "world war 1" never gets the answer stored for "world war 2". Entries within `margin` seconds of expiring are treated as expired;
+        count=False leaves the hit/miss stats alone (for background checks).
+        """
+        vector = embed(query)
+        words = content_words(query)
+        now = time.time() + margin
+        with self._lock:
+            candidates = set()
+            for b in vector:
+                candidates.update(self._index.get((mode, b), ()))
+
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                _, other, _, stored_at, other_words = self._entries[entry_id]
+                if now - stored_at >= self.ttl or other_words != words:
+                    continue
+                score = cosine(vector, other)
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += count
+                return None, best_score
+
+            self._entries.move_to_end(best_id)
+            self.hits += count
+            return self._entries[best_id][2], best_score
+
+    def store(self, mode: str, query: str, answer):
+        vector = embed(query)
+        now = time.time()
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (mode, vector, answer, now, content_words(query))
+            for b in vector:
+                self._index.setdefault((mode, b), set()).add(entry_id)
+
+            while self._entries:
+                oldest_id = next(iter(self._entries))
+                stored_at = self._entries[oldest_id][3]
+                if len(self._entries) <= self.max_entries and now - stored_at < self.ttl:
+                    break
+                self._drop(oldest_id)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+answer_cache = AnswerCache()
+
+
+# -----------------------------
+# Offline evaluation
+# -----------------------------
+def same_question(stored: str, asked: str, threshold: float = SIMILARITY_THRESHOLD) -> bool:
+    cache = AnswerCache(threshold=threshold)
+    cache.store("research", stored, stored)
+    return cache.lookup("research", asked)[0] is not None
+
+
+if __name__ == "__main__":
+    command, path = sys.argv[1], sys.argv[2]
+    wrong = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            label, stored, asked = line.rstrip("\n").split("\t")
+            score = cosine(embed(stored), embed(asked))
+            if same_question(stored, asked) != (label == "same"):
+                wrong += 1
+                print(f"WRONG  {label:<9} {score:.3f}  {stored!r} / {asked!r}")
+    print("all pairs correct" if not wrong else f"{wrong} pairs wrong")
+    sys.exit(1 if wrong else 0)
@@ -1,29 +1,40 @@
-import json
-import re
+import os
+import uuid
 import streamlit as st
 import streamlit.components.v1 as components
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from langchain_groq import ChatGroq
-from langchain_core.output_parsers import PydanticOutputParser
-from langgraph.prebuilt import create_react_agent
-from tools import search_tool, wiki_tool, save_tool
+from tools import research_tools
+from answer_cache import answer_cache
+from concurrency import agent_config
+from streaming import stream_agent
+from parsing import ResearchResponse, ParseError, parse_research
+from router import route
+from tracing import trace, breakdown
+from server import ask
+from speculative import speculate
+from context import budget
+from agent_budget import agent_budget, budgeted_model
+from history import History, Turn, render, PAGE_SIZE
+from memory import memory
+from coalesce import coalesce, flight_key
+from prompts import RESEARCH
 
 load_dotenv()
 
+# Show a per-query latency breakdown under each answer
+SHOW_TRACE = os.getenv("QAI_SHOW_TRACE") == "1"
+# Run agent work on a server.py worker pool instead of in the script thread
+SERVER_URL = os.getenv("QAI_SERVER_URL")
+
+# Shown when research output can't be parsed; not a real answer, so kept out of memory
+UNSTRUCTURED = "I could not structure the research response. Please try again."
+
 st.set_page_config(
     page_title="Qurotz.ai",
     page_icon="🔮",
     layout="wide",
     initial_sidebar_state="collapsed",
 )
-def is_research_query(query: str) -> bool:
-    keywords = [
-        "research", "analyze", "explain", "compare",
-        "impact", "history", "statistics", "data",
-        "sources", "study", "causes", "effects"
-    ]
-    return any(k in query.lower() for k in keywords)
 st.markdown("""
 <style>
 @import url('https://fonts.googleapis.com/css2?family=Cinzel:wght@400;700;900&family=Rajdhani:wght@300;400;600&display=swap');
@@ -236,50 +247,60 @@ html, body, [data-testid="stAppViewContainer"], [data-testid="stApp"] {
 """, unsafe_allow_html=True)
 
 # ── Enter key support via form ────────────────────────────────────────────────
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "history" not in st.session_state:
-    st.session_state.history = []
+    st.session_state.history = History(st.session_state.session_id)
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
 if "thinking" not in st.session_state:
     st.session_state.thinking = False
 if "pending_query" not in st.session_state:
     st.session_state.pending_query = None
 
-class ResearchResponse(BaseModel):
-    topic: str
-    summary: str
-    sources: list[str]
-    tools_used: list[str]
+# Model client and agent are built on first use, so the page renders before
+# langchain_groq and langgraph are imported
+@st.cache_resource
+def get_chat_llm():
+    from llms import get_llm
+    return get_llm()
 
 @st.cache_resource
 def get_agent():
-    llm = ChatGroq(model="llama-3.3-70b-versatile")
-    return create_react_agent(llm, [search_tool, wiki_tool, save_tool])
+    from langgraph.prebuilt import create_react_agent
+    return create_react_agent(budgeted_model(get_chat_llm(), research_tools), research_tools)
+
+@st.cache_resource
+def start_warmup():
+    # Once per server process; main's research path fills the same answer cache
+    from warmup import warmer
+    research = None
+    if warmer.mode == "research":
+        from main import refresh_research as research
+    warmer.start(research=research)
+    return warmer
 
-parser = PydanticOutputParser(pydantic_object=ResearchResponse)
+start_warmup()
 
 def _try_parse(raw_text: str) -> ResearchResponse | None:
     """Attempt to extract and parse a ResearchResponse from raw model output."""
     try:
-        return parser.parse(raw_text)
-    except Exception:
-        pass
-    stripped = re.sub(r"```(?:json)?", "", raw_text).strip().rstrip("`").strip()
-    try:
-        return parser.parse(stripped)
-    except Exception:
-        pass
-    try:
-        match = re.search(r"\{[\s\S]*\}", raw_text)
-        if match:
-            data = json.loads(match.group(0))
-            return ResearchResponse(
-                topic=str(data.get("topic", "")),
-                summary=str(data.get("summary", "")),
-                sources=[str(s) for s in data.get("sources", [])],
-                tools_used=[str(t) for t in data.get("tools_used", [])],
-            )
-    except Exception:
-        pass
-    return None
+        return parse_research(raw_text)
+    except ParseError:
+        return None
+
+def _live_card(activity: list[str], fields: dict) -> str:
+    """Render tool activity and the research fields streamed so far."""
+    rows = ""
+    if activity:
+        rows += f'<div class="struct-label">Tools</div><div>{"".join(activity)}</div><br>'
+    for label, key in (("Topic", "topic"), ("Summary", "summary")):
+        if fields.get(key):
+            rows += f'<div class="struct-label">{label}</div><div class="struct-value">{fields[key]}</div>'
+    if fields.get("sources"):
+        tags = "".join(f'<span class="struct-tag">{s}</span>' for s in fields["sources"] if isinstance(s, str))
+        rows += f'<div class="struct-label">Sources</div><div>{tags}</div>'
+    return f'<div class="chat-agent"><div class="struct-card">{rows}</div></div>'
 
 # ── Header ────────────────────────────────────────────────────────────────────
 st.markdown('<div class="title-wrapper"><span class="qurotz-title">QUROTZ.AI</span></div>', unsafe_allow_html=True)
@@ -293,27 +314,14 @@ st.markdown(f'<div class="{halo_class}"></div>', unsafe_allow_html=True)
 st.markdown('<hr class="qdivider">', unsafe_allow_html=True)
 
 # ── Chat history ──────────────────────────────────────────────────────────────
-for entry in st.session_state.history:
-    st.markdown(f'<div class="chat-human">{entry["query"]}</div>', unsafe_allow_html=True)
-    if entry.get("structured"):
-        r = entry["structured"]
-        tags_sources = "".join(f'<span class="struct-tag">{s}</span>' for s in r.sources)
-        tags_tools   = "".join(f'<span class="struct-tag">{t}</span>' for t in r.tools_used)
-        st.markdown(f"""
-        <div class="chat-agent">
-            <div class="struct-card">
-                <div class="struct-label">Topic</div>
-                <div class="struct-value">{r.topic}</div>
-                <div class="struct-label">Summary</div>
-                <div class="struct-value">{r.summary}</div>
-                <div class="struct-label">Sources</div>
-                <div>{tags_sources}</div><br>
-                <div class="struct-label">Tools Used</div>
-                <div>{tags_tools}</div>
-            </div>
-        </div>""", unsafe_allow_html=True)
-    else:
-        st.markdown(f'<div class="chat-agent">{entry["response"]}</div>', unsafe_allow_html=True)
+history = st.session_state.history
+shown = st.session_state.history_pages * PAGE_SIZE
+if len(history) > shown:
+    if st.button(f"Show earlier ({len(history) - shown})"):
+        st.session_state.history_pages += 1
+        st.rerun()
+for entry in history.page(st.session_state.history_pages):
+    st.markdown(render(entry), unsafe_allow_html=True)
 
 # ── Input (form enables Enter key) ───────────────────────────────────────────
 with st.form(key="query_form", clear_on_submit=True):
@@ -430,67 +438,109 @@ if submit and query.strip():
 
 if st.session_state.thinking and st.session_state.pending_query:
     last_query = st.session_state.pending_query
-
-    with st.spinner(""):
+    convo = memory.get(st.session_state.session_id)
+    first_turn = convo.empty
+
+    def run_shared(mode: str, fn):
+        """Share one run between sessions asking the same first-turn question at once."""
+        if not first_turn:
+            return fn()
+        model = get_chat_llm().model_name
+        config = (model, RESEARCH.name, RESEARCH.version) if mode == "research" else (model,)
+        # "app" keeps these flights apart from main.py's (warm-up runs in this process),
+        # whose functions return different shapes
+        return coalesce(mode, flight_key(mode, last_query, "app", *config), fn)
+
+    with st.spinner(""), trace("app", last_query) as spans:
         try:
-            if is_research_query(last_query):
-                # Research mode
-                agent = get_agent()
-                system_prompt = (
-                    "You are Q.AI, an elite research intelligence.\n"
-                    "If the query requires research:\n"
-                    "- Use tools if needed.\n"
-                    "- Return ONLY valid JSON matching this schema.\n"
-                    f"{parser.get_format_instructions()}\n"
-                    "Do not include any extra text."
-                )
-
-                raw = agent.invoke({
-                    "messages": [
-                        ("system", system_prompt),
-                        ("human", last_query)
-                    ]
-                })
-
-                final_msg = None
-                for msg in reversed(raw["messages"]):
-                    if msg.type == "ai":
-                        final_msg = msg.content
-                        break
-
-                structured = _try_parse(final_msg)
+            # Follow-ups depend on earlier turns, so only the first turn may hit the answer cache
+            picked = route(last_query, use_cache=first_turn)
+
+            if picked.name == "cache":
+                if picked.research:
+                    history.append(Turn(last_query, structured=picked.answer))
+                else:
+                    history.append(Turn(last_query, response=picked.answer))
+
+            elif SERVER_URL and first_turn:
+                # Hand the query to the worker pool behind server.py. Workers have no
+                # conversation memory and use the shared answer cache, so follow-ups
+                # run in-process below with this session's context.
+                job = ask(SERVER_URL, last_query)
+                result = job.get("result")
+                if job["status"] != "done":
+                    response, structured = f"Error: {job.get('error', job['status'])}", None
+                elif isinstance(result, dict):
+                    response, structured = None, ResearchResponse(**result)
+                else:
+                    response, structured = result, None
+                history.append(Turn(last_query, response=response, structured=structured))
 
+            elif picked.research:
+                # Research mode
+                def research_live():
+                    live = st.empty()
+                    activity = []
+                    final_msg = None
+                    fields = {}  # topic/summary parsed so far; kept until the next "fields" event
+                    with speculate(last_query) as spec, budget(last_query), agent_budget():
+                        inputs = spec.prepare({"messages": convo.messages(last_query, RESEARCH.text)})
+                        for event in stream_agent(get_agent(), inputs, config=agent_config()):
+                            if event["type"] == "tool_start":
+                                spec.requested(event["name"], event["args"])
+                                activity.append(f'<span class="struct-tag">{event["name"]} …</span>')
+                            elif event["type"] == "tool_end":
+                                activity.append(f'<span class="struct-tag">{event["name"]} ✓</span>')
+                            elif event["type"] == "fields":
+                                fields = event["fields"]
+                            elif event["type"] == "final":
+                                final_msg = event["text"]
+                                continue
+
+                            live.markdown(_live_card(activity, fields), unsafe_allow_html=True)
+
+                    live.empty()
+                    structured = _try_parse(final_msg) if final_msg else None
+                    if structured and first_turn:
+                        answer_cache.store("research", last_query, structured)
+                    return structured
+
+                structured = run_shared("research", research_live)
                 if structured:
-                    st.session_state.history.append({
-                        "query": last_query,
-                        "structured": structured,
-                        "response": None
-                    })
+                    history.append(Turn(last_query, structured=structured))
                 else:
-                    st.session_state.history.append({
-                        "query": last_query,
-                        "structured": None,
-                        "response": "I could not structure the research response. Please try again."
-                    })
+                    history.append(Turn(
+                        last_query,
+                        response=UNSTRUCTURED,
+                    ))
 
             else:
                 # Conversational mode
-                llm = ChatGroq(model="llama-3.3-70b-versatile")
-                response = llm.invoke(last_query)
-
-                st.session_state.history.append({
-                    "query": last_query,
-                    "structured": None,
-                    "response": response.content
-                })
+                def chat_live():
+                    live = st.empty()
+                    reply = ""
+                    for chunk in get_chat_llm().stream(convo.messages(last_query)):
+                        reply += chunk.content
+                        live.markdown(f'<div class="chat-agent">{reply}</div>', unsafe_allow_html=True)
+                    live.empty()
+                    if first_turn:
+                        answer_cache.store("chat", last_query, reply)
+                    return reply
+
+                history.append(Turn(last_query, response=run_shared("chat", chat_live)))
 
         except Exception as e:
-            st.session_state.history.append({
-                "query": last_query,
-                "structured": None,
-                "response": f"Error: {str(e)}"
-            })
+            history.append(Turn(last_query, response=f"Error: {str(e)}"))
+
+    turn = history.last()
+    if turn.structured:
+        convo.record(last_query, turn.structured.summary, turn.structured.sources, turn.structured.topic)
+    elif turn.response and not turn.response.startswith("Error:") and turn.response != UNSTRUCTURED:
+        convo.record(last_query, turn.response)
+    if SHOW_TRACE:
+        turn.trace = breakdown(spans)
 
     st.session_state.thinking = False
     st.session_state.pending_query = None
+    st.session_state.history_pages = 1
     st.rerun()
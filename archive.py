@@ -0,0 +1,176 @@
+"""Searchable archive of saved research (SQLite + FTS5).
+
+Import an existing research_output.txt:
+    python archive.py import research_output.txt
+Search it:
+    python archive.py search "french revolution"
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from parsing import ParseError, parse_research
+
+# -----------------------------
+# Settings
+# -----------------------------
+ARCHIVE_PATH = os.getenv("QAI_ARCHIVE", "research_archive.db")
+
+_HEADER = "--- Research Output ---\n"
+
+
+def _fields(data: str) -> tuple[str, str, list[str]]:
+    """Pull topic/summary/sources out of saved text, falling back to the raw text."""
+    try:
+        r = parse_research(data)
+        return r.topic, r.summary, r.sources
+    except ParseError:
+        first_line = data.strip().split("\n", 1)[0]
+        return first_line[:200], data, []
+
+
+def _entry_key(timestamp: str, data: str) -> str:
+    """Same timestamp and text means the same saved entry, whichever path stored it."""
+    return timestamp + ":" + hashlib.blake2b(data.strip().encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _match_expression(query: str) -> str:
+    words = re.findall(r"\w+", query.lower())
+    return " OR ".join(f'"{w}"' for w in words)
+
+
+# -----------------------------
+# Archive
+# -----------------------------
+class ResearchArchive:
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS research (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS research_fts USING fts5(
+                topic, summary, sources, content='research', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS research_ai AFTER INSERT ON research BEGIN
+                INSERT INTO research_fts(rowid, topic, summary, sources)
+                VALUES (new.id, new.topic, new.summary, new.sources);
+            END;
+            CREATE INDEX IF NOT EXISTS research_timestamp ON research(timestamp);
+        """)
+        self._add_entry_keys()
+        self._db.commit()
+
+    def _add_entry_keys(self):
+        # Archives created before entries had keys: add and backfill them. Rows
+        # that were already duplicated keep a NULL key, which the index allows.
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(research)")}
+        if "entry_key" not in columns:
+            self._db.execute("ALTER TABLE research ADD COLUMN entry_key TEXT")
+            seen = set()
+            rows = self._db.execute("SELECT id, timestamp, data FROM research ORDER BY id").fetchall()
+            for row_id, timestamp, data in rows:
+                key = _entry_key(timestamp, data)
+                if key not in seen:
+                    seen.add(key)
+                    self._db.execute("UPDATE research SET entry_key = ? WHERE id = ?", (key, row_id))
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS research_entry_key ON research(entry_key)")
+
+    def add_many(self, records: list[dict]) -> int:
+        """Append records shaped like writer records: {"timestamp", "data"}; returns how many were new.
+
+        Entries already in the archive (same timestamp and text) are skipped,
+        so re-importing research_output.txt doesn't duplicate what save_tool
+        already stored.
+        """
+        rows = []
+        for r in records:
+            topic, summary, sources = _fields(r["data"])
+            key = _entry_key(r["timestamp"], r["data"])
+            rows.append((r["timestamp"], topic, summary, json.dumps(sources), r["data"], key))
+        with self._lock:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO research (timestamp, topic, summary, sources, data, entry_key) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    def search(self, query: str, limit: int = 5) -> list[dict]:
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT r.timestamp, r.topic, r.summary, r.sources FROM research_fts "
+                "JOIN research r ON r.id = research_fts.rowid "
+                "WHERE research_fts MATCH ? ORDER BY bm25(research_fts, 5.0, 1.0, 0.5) LIMIT ?",
+                (expression, limit),
+            ).fetchall()
+        return [
+            {"timestamp": t, "topic": topic, "summary": summary, "sources": json.loads(sources)}
+            for t, topic, summary, sources in rows
+        ]
+
+    def recent(self, limit: int = 100) -> list[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT timestamp, topic FROM research ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [{"timestamp": t, "topic": topic} for t, topic in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM research").fetchone()[0]
+
+    def import_text(self, path: str, batch: int = 1000) -> int:
+        """Load '--- Research Output ---' blocks from a research_output.txt file, streaming; returns new entries."""
+        imported, records, block = 0, [], None
+
+        def finish(block):
+            if block and block[0].startswith("Timestamp: "):
+                records.append({"timestamp": block[0][11:].strip(), "data": "".join(block[2:]).strip("\n")})
+
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line == _HEADER:
+                    finish(block)
+                    block = []
+                    if len(records) >= batch:
+                        imported += self.add_many(records)
+                        records = []
+                elif block is not None:
+                    block.append(line)
+        finish(block)
+        return imported + self.add_many(records)
+
+    # Writer sink interface
+    def write(self, records: list[dict]):
+        self.add_many(records)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+archive = ResearchArchive() if ARCHIVE_PATH else None
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "import":
+        print(f"Imported {archive.import_text(sys.argv[2])} entries into {archive.path}")
+    else:
+        for hit in archive.search(" ".join(sys.argv[2:])):
+            print(f"[{hit['timestamp']}] {hit['topic']}\n  {hit['summary'][:200]}\n")
@@ -0,0 +1,77 @@
+"""Compare parsing.parse_research with the old app._try_parse.
+
+Run from the repo root:  python benchmarks/bench_parse.py
+"""
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.output_parsers import PydanticOutputParser
+from parsing import ResearchResponse, ParseError, parse_research
+
+parser = PydanticOutputParser(pydantic_object=ResearchResponse)
+
+
+def legacy_try_parse(raw_text: str) -> ResearchResponse | None:
+    """app._try_parse as it was before parsing.py, kept here as the baseline."""
+    try:
+        return parser.parse(raw_text)
+    except Exception:
+        pass
+    stripped = re.sub(r"```(?:json)?", "", raw_text).strip().rstrip("`").strip()
+    try:
+        return parser.parse(stripped)
+    except Exception:
+        pass
+    try:
+        match = re.search(r"\{[\s\S]*\}", raw_text)
+        if match:
+            data = json.loads(match.group(0))
+            return ResearchResponse(
+                topic=str(data.get("topic", "")),
+                summary=str(data.get("summary", "")),
+                sources=[str(s) for s in data.get("sources", [])],
+                tools_used=[str(t) for t in data.get("tools_used", [])],
+            )
+    except Exception:
+        pass
+    return None
+
+
+def new_try_parse(raw_text: str) -> ResearchResponse | None:
+    try:
+        return parse_research(raw_text)
+    except ParseError:
+        return None
+
+
+def _payload(summary_chars: int, n_sources: int) -> str:
+    return json.dumps({
+        "topic": "Large payload",
+        "summary": "lorem ipsum, dolor {sit} amet. " * (summary_chars // 31),
+        "sources": [f"https://example.com/{i}" for i in range(n_sources)],
+        "tools_used": ["search_tool", "wikipedia"],
+    })
+
+
+CASES = {
+    "clean": _payload(2_000, 5),
+    "fenced_with_prose": "Here you go:\n```json\n" + _payload(2_000, 5) + "\n```\nAnything else?",
+    "large": "Result:\n" + _payload(10_000, 100) + "\nThanks",
+    "unclosed_braces": "{" * 2_000 + " no json here",
+    "prose_braces": "Notes {a} {b} " * 300 + _payload(2_000, 5),
+}
+
+
+if __name__ == "__main__":
+    print(f"{'case':<20} {'chars':>8} {'legacy ms':>11} {'new ms':>8}  parsed (legacy/new)")
+    for name, text in CASES.items():
+        number = 1 if len(text) > 10_000 else 20
+        legacy = timeit.timeit(lambda: legacy_try_parse(text), number=number) / number
+        new = timeit.timeit(lambda: new_try_parse(text), number=number) / number
+        parsed = f"{legacy_try_parse(text) is not None}/{new_try_parse(text) is not None}"
+        print(f"{name:<20} {len(text):>8} {legacy * 1000:>11.2f} {new * 1000:>8.2f}  {parsed}")
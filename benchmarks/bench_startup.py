@@ -0,0 +1,98 @@
+"""Cold-start time of the CLI and Streamlit entry points.
+
+Each sample runs in a fresh interpreter, so nothing is cached in sys.modules.
+Bytecode is compiled beforehand, so samples measure imports rather than compilation.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --baseline benchmarks/results/startup-old.json
+
+Stages:
+  main           import main (time to the CLI prompt)
+  main+chat      ... plus building the chat client
+  main+research  ... plus building the research agent and its tools
+  app            one bare-mode run of app.py (skipped if streamlit is missing)
+"""
+import argparse
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = {
+    "main": "import main",
+    "main+chat": "import main; main.get_chat_llm()",
+    "main+research": "import main; main.get_research_agent()",
+    "app": "import runpy; runpy.run_path('app.py')",
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{code}
+sys.stdout.write(f"\\n@@{{time.perf_counter() - start}}")
+"""
+
+
+def sample(code: str) -> float | None:
+    env = {**os.environ, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "offline-benchmark")}
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE.format(code=code)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    return float(proc.stdout.rsplit("@@", 1)[1])
+
+
+def has_streamlit() -> bool:
+    return subprocess.run([sys.executable, "-c", "import streamlit"], capture_output=True).returncode == 0
+
+
+if __name__ == "__main__":
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument("--runs", type=int, default=5)
+    args.add_argument("--out", help="where to write results JSON")
+    args.add_argument("--baseline", help="earlier results JSON to compare against")
+    args.add_argument("--max-regression", type=float, default=0.25, help="allowed median slowdown vs baseline")
+    opts = args.parse_args()
+
+    compileall.compile_dir(ROOT, quiet=1)
+    stages = dict(STAGES)
+    if not has_streamlit():
+        print("app            skipped (streamlit not installed)")
+        del stages["app"]
+
+    results = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "runs": opts.runs}, "stages": {}}
+    for name, code in stages.items():
+        times = [sample(code) for _ in range(opts.runs)]
+        if None in times:
+            print(f"{name:<14} failed")
+            continue
+        results["stages"][name] = {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000}
+        print(f"{name:<14} median {statistics.median(times) * 1000:7.0f} ms  min {min(times) * 1000:7.0f} ms")
+
+    out = opts.out or os.path.join(ROOT, "benchmarks", "results", f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {out}")
+
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+        failed = []
+        for name, result in results["stages"].items():
+            if name in baseline:
+                before, after = baseline[name]["median_ms"], result["median_ms"]
+                change = (after - before) / before if before else 0.0
+                print(f"{name:<14} {before:7.0f} -> {after:7.0f} ms ({change:+.1%})")
+                if change > opts.max_regression:
+                    failed.append(name)
+        if failed:
+            print("Regressed:", ", ".join(failed))
+            sys.exit(1)
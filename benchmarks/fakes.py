@@ -0,0 +1,92 @@
+"""Deterministic stand-ins for Groq, DuckDuckGo and Wikipedia."""
+import json
+import threading
+import time
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class Timings:
+    """Thread-safe collector of (stage, seconds) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+
+def final_answer(query: str, tools_used: list[str]) -> AIMessage:
+    return AIMessage(content=json.dumps({
+        "topic": query,
+        "summary": f"Scripted summary for {query}. " * 20,
+        "sources": [f"https://example.com/{i}" for i in range(5)],
+        "tools_used": tools_used,
+    }))
+
+
+def tool_step(query: str, names: list[str], step: int) -> AIMessage:
+    calls = [{"name": name, "args": {"query": query}, "id": f"call_{step}_{i}"} for i, name in enumerate(names)]
+    return AIMessage(content="", tool_calls=calls)
+
+
+# Scripts: the tool calls the model makes at each step before answering
+SCRIPTS = {
+    "chat": [],
+    "research_single": [["search_tool"]],
+    "research_multi": [["search_tool", "wikipedia"], ["archive_tool"]],
+    "research_evidence": [["evidence_tool"]],  # the same sources as research_multi in one call
+}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Replays a scripted tool-calling transcript with a fixed latency per call.
+
+    The step is derived from how many AI messages are already in the input,
+    so one instance can serve many concurrent conversations.
+    """
+
+    script: list = []
+    model_name: str = "scripted"
+    latency: float = 0.0
+    timings: object = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        time.sleep(self.latency)
+
+        query = next((m.content for m in reversed(messages) if m.type == "human"), "")
+        step = sum(1 for m in messages if m.type == "ai")
+        if step < len(self.script):
+            message = tool_step(query, self.script[step], step)
+        elif self.script:
+            message = final_answer(query, [name for names in self.script for name in names])
+        else:
+            message = AIMessage(content=f"Scripted reply to: {query}")
+
+        if self.timings is not None:
+            self.timings.add("llm", time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def stand_in(name: str, latency: float, timings: Timings | None = None):
+    """A local replacement for a network backend in tools.backends."""
+
+    def run(query: str) -> str:
+        start = time.perf_counter()
+        time.sleep(latency)
+        if timings is not None:
+            timings.add(f"tool:{name}", time.perf_counter() - start)
+        return f"{name} result for {query}: " + "lorem ipsum dolor sit amet " * 40
+
+    return run
@@ -0,0 +1,173 @@
+"""Offline benchmark of the chat and research hot paths.
+
+Groq, DuckDuckGo and Wikipedia are replaced with the deterministic
+stand-ins in benchmarks/fakes.py, so runs are repeatable and free.
+
+    python benchmarks/run.py --n 50 --workers 4
+    python benchmarks/run.py --baseline benchmarks/results/old.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep runs independent of local state: no disk caches, archive or answer cache
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+os.environ.setdefault("QAI_TOOL_CACHE", "")
+os.environ.setdefault("QAI_ARCHIVE", "")
+os.environ.setdefault("QAI_ANSWER_CACHE_SIZE", "0")
+# Stand-in backends don't need protecting from load
+for backend in ("SEARCH", "WIKI"):
+    os.environ.setdefault(f"QAI_{backend}_RATE", "1000")
+    os.environ.setdefault(f"QAI_{backend}_BURST", "1000")
+os.environ.setdefault("QAI_SAVE_PATH", os.path.join(tempfile.gettempdir(), "qai_bench_output.txt"))
+
+import main
+import tools
+from fakes import SCRIPTS, ScriptedChatModel, Timings, stand_in
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+    }
+
+
+def run_scenario(name: str, n: int, workers: int, llm_latency: float, tool_latency: float,
+                 distinct: int | None = None) -> dict:
+    timings = Timings()
+    model = ScriptedChatModel(script=SCRIPTS[name], latency=llm_latency, timings=timings)
+    tools.backends["search"] = stand_in("search", tool_latency, timings)
+    tools.backends["wiki"] = stand_in("wiki", tool_latency, timings)
+
+    parse = main.parse_research
+
+    def timed_parse(text):
+        start = time.perf_counter()
+        try:
+            return parse(text)
+        finally:
+            timings.add("parse", time.perf_counter() - start)
+
+    main.parse_research = timed_parse
+    if name == "chat":
+        main.chat_llm = model
+    else:
+        main.research_agent = main.build_research_agent(model)
+
+    def one(i):
+        if distinct:
+            i %= distinct  # repeat queries so concurrent duplicates can be coalesced
+        start = time.perf_counter()
+        if name == "chat":
+            main.run_chat(f"{name} query {i}")
+        else:
+            structured, _ = main.run_research(f"{name} topic number {i}")
+            assert structured is not None, "scripted research answer did not parse"
+        timings.add("total", time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(n)))
+        elapsed = time.perf_counter() - start
+        samples, timings.samples = timings.samples, {}
+
+        # tracemalloc slows allocation-heavy code, so memory gets its own pass
+        tracemalloc.start()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(n, n + min(n, 10))))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        main.parse_research = parse
+
+    return {
+        "queries": n,
+        "throughput_qps": n / elapsed,
+        "peak_memory_kb": peak / 1024,
+        "stages": {stage: percentiles(s) for stage, s in sorted(samples.items())},
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    failures = []
+    for name, result in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old:
+            continue
+        before, after = old["stages"]["total"]["p50_ms"], result["stages"]["total"]["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        print(f"{name:<16} p50 {before:8.1f} -> {after:8.1f} ms ({change:+.1%})")
+        if change > max_regression:
+            failures.append(name)
+    return failures
+
+
+if __name__ == "__main__":
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument("--scenarios", nargs="+", default=list(SCRIPTS), choices=list(SCRIPTS))
+    args.add_argument("--n", type=int, default=30, help="queries per scenario")
+    args.add_argument("--workers", type=int, default=1)
+    args.add_argument("--distinct", type=int, help="cycle through this many distinct queries")
+    args.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    args.add_argument("--tool-latency", type=float, default=0.1, help="seconds per fake search/wiki call")
+    args.add_argument("--out", help="where to write results JSON")
+    args.add_argument("--baseline", help="earlier results JSON to compare against")
+    args.add_argument("--max-regression", type=float, default=0.2, help="allowed p50 slowdown vs baseline")
+    opts = args.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "args": vars(opts),
+        },
+        "scenarios": {},
+    }
+    for name in opts.scenarios:
+        results["scenarios"][name] = r = run_scenario(
+            name, opts.n, opts.workers, opts.llm_latency, opts.tool_latency, opts.distinct
+        )
+        total = r["stages"]["total"]
+        print(f"{name:<16} {r['throughput_qps']:7.2f} q/s  p50 {total['p50_ms']:7.1f} ms  "
+              f"p99 {total['p99_ms']:7.1f} ms  peak {r['peak_memory_kb']:8.0f} KiB")
+
+    out = opts.out or os.path.join(ROOT, "benchmarks", "results", f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {out}")
+
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as f:
+            failed = compare(results, json.load(f), opts.max_regression)
+        if failed:
+            print("Regressed:", ", ".join(failed))
+            sys.exit(1)
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from tracing import annotate
+
+# -----------------------------
+# Settings
+# -----------------------------
+CACHE_PATH = os.getenv("QAI_TOOL_CACHE", "tool_cache.db")
+CACHE_SIZE = int(os.getenv("QAI_TOOL_CACHE_SIZE", "512"))
+
+# Seconds an entry stays fresh, per tool
+DEFAULT_TTLS = {
+    "search": int(os.getenv("QAI_SEARCH_TTL", "3600")),
+    "wiki": int(os.getenv("QAI_WIKI_TTL", "86400")),
+}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so equivalent queries share a key."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+# -----------------------------
+# Single-flight
+# -----------------------------
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one loader per key; concurrent callers wait for and share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: one task per key, awaited by every caller."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the run the others are waiting on
+        return await asyncio.shield(task)
+
+
+# -----------------------------
+# Tool result cache
+# -----------------------------
+class ToolCache:
+    """In-memory LRU in front of a SQLite store, with a TTL per tool."""
+
+    def __init__(self, path: str | None = CACHE_PATH, max_entries: int = CACHE_SIZE, ttls: dict | None = None):
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._lru = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache ("
+                "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(tool: str, query: str) -> str:
+        return f"{tool}:{normalize_query(query)}"
+
+    def _fresh(self, tool: str, stored_at: float) -> bool:
+        ttl = self.ttls.get(tool)
+        return ttl is None or time.time() - stored_at < ttl
+
+    def _remember(self, key: str, stored_at: float, value: str):
+        self._lru[key] = (stored_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, tool: str, query: str) -> str | None:
+        key = self.key(tool, query)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT stored_at, value FROM tool_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = row
+                    self._remember(key, *entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if not self._fresh(tool, stored_at):
+                # Left in place for stale() and age() until size eviction or a refresh replaces it
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def stale(self, tool: str, query: str) -> str | None:
+        """Last stored value regardless of age, for when the backend is unavailable."""
+        key = self.key(tool, query)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None and self._db is not None:
+                entry = self._db.execute(
+                    "SELECT stored_at, value FROM tool_cache WHERE key = ?", (key,)
+                ).fetchone()
+        return entry[1] if entry else None
+
+    def age(self, tool: str, query: str) -> float | None:
+        """Seconds since the entry was stored, or None if there is none; doesn't count as a lookup."""
+        key = self.key(tool, query)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None and self._db is not None:
+                entry = self._db.execute(
+                    "SELECT stored_at, value FROM tool_cache WHERE key = ?", (key,)
+                ).fetchone()
+        return time.time() - entry[0] if entry else None
+
+    def set(self, tool: str, query: str, value: str):
+        key = self.key(tool, query)
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tool_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                    (key, stored_at, value),
+                )
+                self._db.commit()
+
+    def fetch(self, tool: str, query: str, loader) -> str:
+        """Return the cached value, or run `loader` once for all concurrent misses."""
+        value = self.get(tool, query)
+        annotate(cache_hit=value is not None)
+        if value is not None:
+            return value
+
+        def load():
+            value = loader()
+            self.set(tool, query, value)
+            return value
+
+        return self._flight.do(self.key(tool, query), load)
+
+    def refresh(self, tool: str, query: str, loader) -> str:
+        """Run `loader` and store its value whatever the cache holds, sharing the load with fetch()."""
+        def load():
+            value = loader()
+            self.set(tool, query, value)
+            return value
+
+        return self._flight.do(self.key(tool, query), load)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self._flight.coalesced,
+                "entries": len(self._lru),
+            }
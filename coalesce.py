@@ -0,0 +1,64 @@
+import hashlib
+import os
+import threading
+from cache import AsyncSingleFlight, SingleFlight, normalize_query
+from tracing import annotate, metrics
+
+# -----------------------------
+# Settings
+# -----------------------------
+# Share one execution between identical chat/research queries that are in flight at once
+ENABLED = os.getenv("QAI_COALESCE", "1") == "1"
+
+flights = SingleFlight()
+async_flights = AsyncSingleFlight()
+
+_lock = threading.Lock()
+counts = {}  # (mode, "executed" | "coalesced") -> requests
+
+metrics.gauges["qai_coalesce_total"] = lambda: {f'mode="{m}",outcome="{o}"': v for (m, o), v in counts.items()}
+
+
+def _count(mode: str, led: bool):
+    key = (mode, "executed" if led else "coalesced")
+    with _lock:
+        counts[key] = counts.get(key, 0) + 1
+    annotate(coalesced=not led)
+
+
+def flight_key(mode: str, query: str, *config) -> str:
+    """Normalized query plus whatever else shapes the answer (model, prompt, ...)."""
+    digest = hashlib.blake2b(repr(config).encode("utf-8"), digest_size=8).hexdigest()
+    return f"{mode}:{digest}:{normalize_query(query)}"
+
+
+def coalesce(mode: str, key: str, fn):
+    """Run `fn`, or wait for the identical run already in flight and share its result or error."""
+    if not ENABLED:
+        return fn()
+    led = []
+
+    def lead():
+        led.append(True)
+        return fn()
+
+    try:
+        return flights.do(key, lead)
+    finally:
+        _count(mode, bool(led))
+
+
+async def acoalesce(mode: str, key: str, fn):
+    """coalesce() for coroutine functions."""
+    if not ENABLED:
+        return await fn()
+    led = []
+
+    async def lead():
+        led.append(True)
+        return await fn()
+
+    try:
+        return await async_flights.do(key, lead)
+    finally:
+        _count(mode, bool(led))
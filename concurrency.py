@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# -----------------------------
+# Settings
+# -----------------------------
+# Upper bound on tool calls run at once within one agent step
+TOOL_WORKERS = int(os.getenv("QAI_TOOL_WORKERS", "4"))
+
+TOOL_LIMITS = {
+    "search": int(os.getenv("QAI_SEARCH_CONCURRENCY", "2")),
+    "wiki": int(os.getenv("QAI_WIKI_CONCURRENCY", "2")),
+}
+
+TOOL_TIMEOUTS = {
+    "search": float(os.getenv("QAI_SEARCH_TIMEOUT", "15")),
+    "wiki": float(os.getenv("QAI_WIKI_TIMEOUT", "10")),
+}
+
+
+# Hard stop for the agent graph in case a model ignores the forced final answer
+# (agent_budget): each tool round is two graph steps, plus the final answer
+RECURSION_LIMIT = 2 * int(os.getenv("QAI_AGENT_MAX_STEPS", "6")) + 5
+
+
+def agent_config(**extra) -> dict:
+    """Run config that lets the agent's ToolNode execute one step's tool calls in parallel."""
+    return {"max_concurrency": TOOL_WORKERS, "recursion_limit": RECURSION_LIMIT, **extra}
+
+
+# -----------------------------
+# Per-tool limits and timeouts
+# -----------------------------
+class ToolLimiter:
+    """Caps concurrent calls per tool and bounds how long a caller waits for one."""
+
+    def __init__(self, limits: dict = TOOL_LIMITS, timeouts: dict = TOOL_TIMEOUTS):
+        self.timeouts = dict(timeouts)
+        self._slots = {name: threading.BoundedSemaphore(n) for name, n in limits.items()}
+        self._pool = ThreadPoolExecutor(max_workers=sum(limits.values()), thread_name_prefix="qai-tool")
+        self.timed_out = {name: 0 for name in limits}
+
+    def run(self, name: str, fn):
+        """Call `fn` in the tool's pool; raise TimeoutError if it misses the deadline.
+
+        The slot is released when `fn` actually finishes, so an abandoned call
+        still counts against the limit until it returns.
+        """
+        timeout = self.timeouts.get(name)
+        slots = self._slots[name]
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if not slots.acquire(timeout=timeout):
+            self.timed_out[name] += 1
+            raise TimeoutError(f"{name} is busy; no slot within {timeout:g}s")
+
+        try:
+            future = self._pool.submit(fn)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeout:
+            self.timed_out[name] += 1
+            raise TimeoutError(f"{name} timed out after {timeout:g}s") from None
+
+
+limiter = ToolLimiter()
@@ -0,0 +1,187 @@
+import contextvars
+import hashlib
+import math
+import os
+import re
+import threading
+from contextlib import contextmanager
+from tracing import annotate
+
+# -----------------------------
+# Settings
+# -----------------------------
+CALL_TOKENS = int(os.getenv("QAI_TOOL_TOKENS", "600"))  # per tool result
+RUN_TOKENS = int(os.getenv("QAI_RUN_TOOL_TOKENS", "2400"))  # all tool results in one query
+PASSAGE_WORDS = 60
+NEAR_DUPLICATE = 0.8  # shingle Jaccard above which a passage counts as seen
+NO_NEW_INFORMATION = "No new information within the context budget for this query."
+
+_WORD = re.compile(r"\w+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English)."""
+    return (len(text) + 3) // 4
+
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def passages(text: str, size: int = PASSAGE_WORDS) -> list[str]:
+    """Split text into sentence-aligned passages of about `size` words."""
+    chunks, current, count = [], [], 0
+    for sentence in _SENTENCE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current.append(sentence)
+        count += len(sentence.split())
+        if count >= size:
+            chunks.append(" ".join(current))
+            current, count = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def bm25(query: str, docs: list[str], k1: float = 1.5, b: float = 0.75) -> list[float]:
+    terms = set(_words(query))
+    tokenized = [_words(d) for d in docs]
+    if not terms or not docs:
+        return [0.0] * len(docs)
+
+    avg_len = sum(len(t) for t in tokenized) / len(tokenized) or 1.0
+    df = {term: sum(1 for t in tokenized if term in t) for term in terms}
+    scores = []
+    for words in tokenized:
+        counts = {}
+        for w in words:
+            if w in terms:
+                counts[w] = counts.get(w, 0) + 1
+        score = 0.0
+        for term, tf in counts.items():
+            idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(words) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def _shingles(text: str) -> set[int]:
+    words = _words(text)
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + 3]).encode(), digest_size=8).digest(), "little")
+        for i in range(max(1, len(words) - 2))
+    }
+
+
+# -----------------------------
+# Per-query budget
+# -----------------------------
+class RunBudget:
+    """Tokens left for tool output in one query, plus the passages already shown."""
+
+    def __init__(self, query: str = "", tokens: int = RUN_TOKENS):
+        self.query = query
+        self.remaining = tokens
+        self._seen = []  # shingle sets of passages already given to the model
+        self._lock = threading.Lock()
+        self.trimmed_tokens = 0
+        self.duplicates = 0
+
+    def _is_duplicate(self, shingles: set[int]) -> bool:
+        for seen in self._seen:
+            overlap = len(shingles & seen) / (len(shingles | seen) or 1)
+            if overlap >= NEAR_DUPLICATE:
+                return True
+        return False
+
+    def _select(self, chunks: list[str], order, limit: int) -> tuple[list[int], int]:
+        """Take chunks in `order` that fit `limit` tokens and weren't shown before. Caller holds the lock."""
+        chosen, used = [], 0
+        for i in order:
+            cost = estimate_tokens(chunks[i])
+            if used + cost > limit:
+                continue
+            shingles = _shingles(chunks[i])
+            if self._is_duplicate(shingles):
+                self.duplicates += 1
+                continue
+            self._seen.append(shingles)
+            chosen.append(i)
+            used += cost
+        return chosen, used
+
+    def take(self, chunks: list[str], call_tokens: int = CALL_TOKENS) -> list[int]:
+        """Indices of the already-ranked chunks that fit the budgets, best first."""
+        with self._lock:
+            chosen, used = self._select(chunks, range(len(chunks)), min(call_tokens, self.remaining))
+            self.remaining -= used
+            self.trimmed_tokens += sum(estimate_tokens(c) for c in chunks) - used
+        annotate(tokens_out=used)
+        return chosen
+
+    def fit(self, text: str, query: str, call_tokens: int = CALL_TOKENS) -> str:
+        """Keep the passages most relevant to the query that fit the budgets, in original order."""
+        chunks = passages(text)
+        if not chunks:
+            return text
+
+        scores = bm25(f"{self.query} {query}", chunks)
+        ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+        original = estimate_tokens(text)
+
+        with self._lock:
+            limit = min(call_tokens, self.remaining)
+            chosen, used = self._select(chunks, ranked, limit)
+
+            top = ranked[0]
+            if not chosen and limit > 0 and estimate_tokens(chunks[top]) > limit:
+                # A single passage longer than the budget: keep its head, unless that
+                # was already shown (then it gets the "no new information" reply)
+                head = chunks[top][:limit * 4]
+                shingles = _shingles(head)
+                if self._is_duplicate(shingles):
+                    self.duplicates += 1
+                else:
+                    chunks[top] = head
+                    self._seen.append(shingles)
+                    chosen.append(top)
+                    used = estimate_tokens(head)
+            self.remaining -= used
+            self.trimmed_tokens += original - used
+
+        annotate(tokens_in=original, tokens_out=used)
+        if not chosen:
+            return NO_NEW_INFORMATION
+        return " ... ".join(chunks[i] for i in sorted(chosen))
+
+
+_budget = contextvars.ContextVar("qai_budget", default=None)
+
+
+@contextmanager
+def budget(query: str, tokens: int = RUN_TOKENS):
+    """Share one RunBudget across every tool call made while answering `query`."""
+    run = RunBudget(query, tokens)
+    token = _budget.set(run)
+    try:
+        yield run
+    finally:
+        try:
+            _budget.reset(token)
+        except ValueError:
+            _budget.set(None)
+
+
+def fit(text: str, query: str) -> str:
+    """Fit one tool result to the active query budget (or a fresh one outside a query)."""
+    run = _budget.get() or RunBudget()
+    return run.fit(text, query)
+
+
+def take(chunks: list[str], call_tokens: int = CALL_TOKENS) -> list[int]:
+    """RunBudget.take() on the active query budget (or a fresh one outside a query)."""
+    run = _budget.get() or RunBudget()
+    return run.take(chunks, call_tokens)
@@ -0,0 +1,209 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from parsing import ResearchResponse
+
+# -----------------------------
+# Settings
+# -----------------------------
+MAX_TURNS = int(os.getenv("QAI_HISTORY_TURNS", "50"))  # kept in memory per session
+PAGE_SIZE = int(os.getenv("QAI_HISTORY_PAGE", "10"))  # turns rendered per page
+HISTORY_DIR = os.getenv("QAI_HISTORY_DIR", os.path.join(tempfile.gettempdir(), "qai_history"))
+MAX_AGE = float(os.getenv("QAI_HISTORY_MAX_AGE", "86400"))  # seconds before an untouched spill file is pruned
+
+
+# -----------------------------
+# One question/answer turn
+# -----------------------------
+@dataclass(slots=True)
+class Turn:
+    query: str
+    response: str | None = None
+    structured: ResearchResponse | None = None
+    trace: str | None = None
+    html: str | None = field(default=None, repr=False, compare=False)  # memoized render
+
+    def to_dict(self) -> dict:
+        return {
+            "query": self.query,
+            "response": self.response,
+            "structured": self.structured.model_dump() if self.structured else None,
+            "trace": self.trace,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Turn":
+        structured = data.get("structured")
+        return cls(
+            query=data["query"],
+            response=data.get("response"),
+            structured=ResearchResponse(**structured) if structured else None,
+            trace=data.get("trace"),
+        )
+
+
+def _tags(values: list[str]) -> str:
+    return "".join(f'<span class="struct-tag">{v}</span>' for v in values)
+
+
+def render(turn: Turn) -> str:
+    """HTML for one turn, built once and reused on every rerun."""
+    if turn.html is not None:
+        return turn.html
+
+    parts = [f'<div class="chat-human">{turn.query}</div>']
+    r = turn.structured
+    if r:
+        parts.append(
+            '<div class="chat-agent"><div class="struct-card">'
+            f'<div class="struct-label">Topic</div><div class="struct-value">{r.topic}</div>'
+            f'<div class="struct-label">Summary</div><div class="struct-value">{r.summary}</div>'
+            f'<div class="struct-label">Sources</div><div>{_tags(r.sources)}</div><br>'
+            f'<div class="struct-label">Tools Used</div><div>{_tags(r.tools_used)}</div>'
+            '</div></div>'
+        )
+    else:
+        parts.append(f'<div class="chat-agent">{turn.response}</div>')
+    if turn.trace:
+        parts.append(f'<div class="struct-label" style="opacity:0.6">{turn.trace}</div>')
+    turn.html = "".join(parts)
+    return turn.html
+
+
+# -----------------------------
+# Per-session history
+# -----------------------------
+_live = set()  # spill paths of History objects still in memory; never pruned
+_live_lock = threading.Lock()
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _release(path: str):
+    with _live_lock:
+        _live.discard(path)
+    _remove(path)
+
+
+def prune(directory: str = HISTORY_DIR, max_age: float = MAX_AGE) -> int:
+    """Delete spill files not written for `max_age` seconds, left by sessions that never ended cleanly.
+
+    Files of sessions still open in this process are kept however idle they are.
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    with _live_lock:
+        live = set(_live)
+    for entry in entries:
+        try:
+            if entry.name.endswith(".jsonl") and entry.path not in live and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+class History:
+    """Recent turns in memory; older ones spilled to a per-session JSONL file.
+
+    Only byte offsets of spilled turns stay in memory, so a page of old
+    turns is read back with a seek per line instead of loading the file.
+    The file is deleted when the History is garbage collected (the session
+    ended); files from sessions that died with the process are pruned when
+    the next History is created.
+    """
+
+    def __init__(self, session_id: str, max_turns: int = MAX_TURNS, directory: str = HISTORY_DIR):
+        self.path = os.path.join(directory, f"{session_id}.jsonl")
+        self.max_turns = max_turns
+        self._recent = deque()
+        self._offsets = []  # file offset of each spilled turn, oldest first
+        self._size = 0  # bytes this History has written to its file
+        self._lock = threading.Lock()
+        with _live_lock:
+            _live.add(self.path)
+        prune(directory)
+        weakref.finalize(self, _release, self.path)
+
+    def __len__(self) -> int:
+        return len(self._offsets) + len(self._recent)
+
+    def append(self, turn: Turn) -> Turn:
+        with self._lock:
+            self._recent.append(turn)
+            if len(self._recent) > self.max_turns:
+                self._spill(len(self._recent) - self.max_turns)
+        return turn
+
+    def last(self) -> Turn | None:
+        return self._recent[-1] if self._recent else None
+
+    def _check(self):
+        """Forget spilled turns whose file was deleted or replaced behind our back. Caller holds the lock."""
+        try:
+            intact = os.path.getsize(self.path) == self._size
+        except OSError:
+            intact = self._size == 0
+        if not intact:
+            self._offsets = []
+            self._size = 0
+            _remove(self.path)
+
+    def _spill(self, count: int):
+        self._check()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab") as f:
+            for _ in range(count):
+                turn = self._recent.popleft()
+                self._offsets.append(f.tell())
+                f.write(json.dumps(turn.to_dict(), ensure_ascii=False).encode("utf-8") + b"\n")
+            self._size = f.tell()
+
+    def _load(self, indices: range) -> list[Turn]:
+        turns = []
+        try:
+            with open(self.path, "rb") as f:
+                for i in indices:
+                    f.seek(self._offsets[i])
+                    turns.append(Turn.from_dict(json.loads(f.readline())))
+        except (OSError, ValueError, KeyError):
+            self._offsets, self._size = [], 0
+            return []
+        return turns
+
+    def window(self, start: int, stop: int) -> list[Turn]:
+        """Turns[start:stop] in chronological order, reading spilled ones from disk."""
+        with self._lock:
+            self._check()
+            spilled = len(self._offsets)
+            start, stop = max(0, start), min(stop, spilled + len(self._recent))
+            turns = self._load(range(start, min(stop, spilled))) if start < spilled else []
+            recent = list(self._recent)
+        return turns + recent[max(0, start - spilled):max(0, stop - spilled)]
+
+    def page(self, pages: int = 1, size: int = PAGE_SIZE) -> list[Turn]:
+        """The newest `pages * size` turns, oldest first."""
+        total = len(self)
+        return self.window(total - pages * size, total)
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._offsets = []
+            self._size = 0
+            _remove(self.path)
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+import httpx
+from langchain_groq import ChatGroq
+from tracing import llm_tracer
+from resilience import ResilientTransport, AsyncResilientTransport
+
+# -----------------------------
+# Settings
+# -----------------------------
+DEFAULT_MODEL = os.getenv("QAI_MODEL", "llama-3.3-70b-versatile")
+MAX_CONNECTIONS = int(os.getenv("QAI_HTTP_MAX_CONNECTIONS", "20"))
+KEEPALIVE_SECONDS = float(os.getenv("QAI_HTTP_KEEPALIVE", "60"))
+
+
+# -----------------------------
+# Per-loop async transport
+# -----------------------------
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """One async connection pool per event loop, behind a single AsyncClient.
+
+    Pooled connections belong to the loop that opened them; reusing them from
+    a later asyncio.run() fails on the first request and costs a retry. Each
+    loop gets its own AsyncResilientTransport, dropped with the loop.
+    """
+
+    def __init__(self, backend: str, **kwargs):
+        self._backend = backend
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._transports = weakref.WeakKeyDictionary()  # loop -> AsyncResilientTransport
+
+    def _current(self) -> AsyncResilientTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = AsyncResilientTransport(self._backend, **self._kwargs)
+            return transport
+
+    async def handle_async_request(self, request):
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+        if transport is not None:
+            await transport.aclose()
+
+
+# -----------------------------
+# Client registry
+# -----------------------------
+class ClientRegistry:
+    """Long-lived ChatGroq clients, one per model/config, over one keep-alive HTTP pool.
+
+    Requests go through resilience's "groq" backend (rate limit, retries,
+    circuit breaker), so the SDK's own retries are turned off.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        )
+        self._http = httpx.Client(transport=ResilientTransport("groq", limits=limits))
+        self._async_http = httpx.AsyncClient(transport=LoopLocalTransport("groq", limits=limits))
+        self.created = 0
+        self.reused = 0
+        self.setup_seconds = 0.0
+
+    def get(self, model: str = DEFAULT_MODEL, **params) -> ChatGroq:
+        key = (model, tuple(sorted(params.items())))
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is not None:
+                self.reused += 1
+                return llm
+
+            start = time.perf_counter()
+            llm = ChatGroq(
+                model=model,
+                http_client=self._http,
+                http_async_client=self._async_http,
+                max_retries=0,
+                callbacks=[llm_tracer],
+                **params,
+            )
+            self.setup_seconds += time.perf_counter() - start
+            self.created += 1
+            self._clients[key] = llm
+            return llm
+
+    def open_connections(self) -> int | None:
+        pool = getattr(getattr(self._http, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return None if connections is None else len(connections)
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.created + self.reused
+            avg_setup = self.setup_seconds / self.created if self.created else 0.0
+            return {
+                "clients": len(self._clients),
+                "created": self.created,
+                "reused": self.reused,
+                "reuse_rate": self.reused / requests if requests else 0.0,
+                "setup_ms_saved": self.reused * avg_setup * 1000,
+                "open_connections": self.open_connections(),
+            }
+
+
+registry = ClientRegistry()
+
+
+def get_llm(model: str = DEFAULT_MODEL, **params) -> ChatGroq:
+    return registry.get(model, **params)
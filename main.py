@@ -1,114 +1,476 @@
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from langchain_groq import ChatGroq
-from langchain_core.output_parsers import PydanticOutputParser
-from langgraph.prebuilt import create_react_agent
-from tools import search_tool, wiki_tool, save_tool
+from answer_cache import answer_cache
+from concurrency import agent_config
+from streaming import stream_agent
+from parsing import ResearchResponse, ParseError, parse_research
+from router import is_research_query
+from tracing import traced
+from speculative import speculate
+from context import budget
+from agent_budget import agent_budget, budgeted_model
+from memory import memory
+from coalesce import coalesce, acoalesce, flight_key
+from prompts import RESEARCH
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import itertools
 import json
+import os
+import sys
+import threading
+import time
 
 load_dotenv()
 
+NO_RESPONSE = "No valid response returned."
+
 # -----------------------------
-# Schema for structured research
+# Models
 # -----------------------------
-class ResearchResponse(BaseModel):
-    topic: str
-    summary: str
-    sources: list[str]
-    tools_used: list[str]
+# Built on first use: the CLI prompts before langchain_groq is imported, and
+# chat queries never pay for langgraph or the agent. Both modes share one
+# long-lived client and its connection pool.
+chat_llm = None
+research_agent = None
+_agent_lock = threading.Lock()
+
+
+def get_chat_llm():
+    global chat_llm
+    if chat_llm is None:
+        from llms import get_llm
+        chat_llm = get_llm()
+    return chat_llm
+
+
+def build_research_agent(llm):
+    from langgraph.prebuilt import create_react_agent
+    from tools import research_tools
+    return create_react_agent(budgeted_model(llm, research_tools), research_tools)
+
+
+def get_research_agent():
+    global research_agent
+    with _agent_lock:
+        if research_agent is None:
+            from llms import get_llm
+            research_agent = build_research_agent(get_llm())
+    return research_agent
 
 
 # -----------------------------
-# Models
+# Conversation memory
 # -----------------------------
-chat_llm = ChatGroq(model="llama-3.3-70b-versatile")
-research_llm = ChatGroq(model="llama-3.3-70b-versatile")
+# With a session id, prompts carry that session's recent turns and summary.
+# Only a session's first turn uses the answer cache or shares an in-flight
+# run with identical queries: later answers depend on context.
+def fresh(convo) -> bool:
+    return convo is None or convo.empty
 
-parser = PydanticOutputParser(pydantic_object=ResearchResponse)
 
-tools = [search_tool, wiki_tool, save_tool]
-research_agent = create_react_agent(research_llm, tools)
+def cached_answer(mode: str, query: str, convo):
+    if not fresh(convo):
+        return None
+    cached, _ = answer_cache.lookup(mode, query)
+    return cached
+
+
+def remember(query: str, answer, convo):
+    """Add a finished turn to the session's memory; placeholders for failed runs are left out."""
+    if convo is None or answer is None or answer == NO_RESPONSE:
+        return
+    if isinstance(answer, ResearchResponse):
+        convo.record(query, answer.summary, answer.sources, answer.topic)
+    else:
+        convo.record(query, answer)
+
+
+def chat_messages(query: str, convo):
+    return query if convo is None else convo.messages(query)
 
 
 # -----------------------------
-# Query classifier
+# Coalescing
 # -----------------------------
-def is_research_query(query: str) -> bool:
-    research_keywords = [
-        "research", "analyze", "explain", "compare",
-        "history", "impact", "causes", "statistics",
-        "data", "sources", "study"
-    ]
-    return any(word in query.lower() for word in research_keywords)
+def flight_config(mode: str) -> tuple:
+    if mode == "chat":
+        return (get_chat_llm().model_name,)
+    return (get_chat_llm().model_name, RESEARCH.name, RESEARCH.version)
+
+
+def shared(mode: str, query: str, convo, run):
+    """Run `run`, sharing it with identical first-turn queries already in flight."""
+    if not fresh(convo):
+        return run()
+    return coalesce(mode, flight_key(mode, query, *flight_config(mode)), run)
+
+
+async def ashared(mode: str, query: str, convo, run):
+    if not fresh(convo):
+        return await run()
+    return await acoalesce(mode, flight_key(mode, query, *flight_config(mode)), run)
 
 
 # -----------------------------
 # Conversational Mode
 # -----------------------------
-def run_chat(query: str):
-    response = chat_llm.invoke(query)
-    return response.content
+def _chat(query: str, convo) -> str:
+    content = get_chat_llm().invoke(chat_messages(query, convo)).content
+    if fresh(convo):
+        answer_cache.store("chat", query, content)
+    return content
+
+
+@traced("chat")
+def run_chat(query: str, session: str | None = None):
+    convo = memory.get(session)
+    reply = cached_answer("chat", query, convo)
+    if reply is None:
+        reply = shared("chat", query, convo, lambda: _chat(query, convo))
+    remember(query, reply, convo)
+    return reply
 
 
 # -----------------------------
 # Research Mode
 # -----------------------------
-def run_research(query: str):
-    system_prompt = f"""
-You are Q.AI, an elite research intelligence system.
-
-If the query requires research:
-- Use tools when necessary.
-- Respond ONLY in valid JSON.
-- Follow this exact schema:
-{parser.get_format_instructions()}
-
-Do not include extra text outside JSON.
-"""
-
-    raw = research_agent.invoke({
+def research_messages(query: str, convo=None):
+    if convo is not None:
+        return {"messages": convo.messages(query, RESEARCH.text)}
+    return {
         "messages": [
-            ("system", system_prompt),
+            ("system", RESEARCH.text),
             ("human", query)
         ]
-    })
+    }
+
 
+def final_text(raw):
     # Extract final AI message only
-    final_message = None
     for msg in reversed(raw["messages"]):
         if msg.type == "ai":
-            final_message = msg.content
-            break
+            return msg.content
+    return None
+
 
+def finish_research(query: str, final_message, store: bool = True):
     if not final_message:
-        return None, "No valid response returned."
+        return None, NO_RESPONSE
 
     try:
-        structured = parser.parse(final_message)
-        return structured, None
-    except Exception:
+        structured = parse_research(final_message)
+    except ParseError:
         return None, final_message
+    if store:
+        answer_cache.store("research", query, structured)
+    return structured, None
+
+
+def _research(query: str, convo):
+    with speculate(query) as spec, budget(query), agent_budget():
+        raw = get_research_agent().invoke(spec.prepare(research_messages(query, convo)), config=agent_config())
+        spec.observe(raw["messages"])
+    return finish_research(query, final_text(raw), store=fresh(convo))
+
+
+@traced("research")
+def run_research(query: str, session: str | None = None):
+    convo = memory.get(session)
+    cached = cached_answer("research", query, convo)
+    if cached is not None:
+        remember(query, cached, convo)
+        return cached, None
+
+    structured, fallback = shared("research", query, convo, lambda: _research(query, convo))
+    remember(query, structured or fallback, convo)
+    return structured, fallback
+
+
+@traced("warmup")
+def refresh_research(query: str):
+    """Research `query` past the answer cache and store the result (used by warmup.py)."""
+    return shared("research", query, None, lambda: _research(query, None))
+
+
+# -----------------------------
+# Streaming Mode
+# -----------------------------
+@traced("chat")
+def stream_chat(query: str, session: str | None = None):
+    """Yield the chat reply piece by piece as the model produces it."""
+    convo = memory.get(session)
+    cached = cached_answer("chat", query, convo)
+    if cached is not None:
+        remember(query, cached, convo)
+        yield cached
+        return
+
+    parts = []
+    for chunk in get_chat_llm().stream(chat_messages(query, convo)):
+        parts.append(chunk.content)
+        yield chunk.content
+    reply = "".join(parts)
+    if fresh(convo):
+        answer_cache.store("chat", query, reply)
+    remember(query, reply, convo)
+
+
+@traced("research")
+def stream_research(query: str, session: str | None = None):
+    """Yield agent events (see streaming.stream_agent); the final event carries the parsed result."""
+    convo = memory.get(session)
+    cached = cached_answer("research", query, convo)
+    if cached is not None:
+        remember(query, cached, convo)
+        yield {"type": "final", "structured": cached, "fallback": None}
+        return
+
+    with speculate(query) as spec, budget(query), agent_budget():
+        for event in stream_agent(get_research_agent(), spec.prepare(research_messages(query, convo)), agent_config()):
+            if event["type"] == "tool_start":
+                spec.requested(event["name"], event["args"])
+            elif event["type"] == "final":
+                structured, fallback = finish_research(query, event["text"], store=fresh(convo))
+                remember(query, structured or fallback, convo)
+                event = {"type": "final", "structured": structured, "fallback": fallback}
+            yield event
+
+
+# -----------------------------
+# Async Mode
+# -----------------------------
+# Sync tools are run off the event loop by LangChain's executor, so
+# blocking search/wiki calls don't stall other queries.
+async def _achat(query: str, convo) -> str:
+    content = (await get_chat_llm().ainvoke(chat_messages(query, convo))).content
+    if fresh(convo):
+        answer_cache.store("chat", query, content)
+    return content
+
+
+@traced("chat")
+async def arun_chat(query: str, session: str | None = None):
+    convo = memory.get(session)
+    reply = cached_answer("chat", query, convo)
+    if reply is None:
+        reply = await ashared("chat", query, convo, lambda: _achat(query, convo))
+    remember(query, reply, convo)
+    return reply
+
+
+async def _aresearch(query: str, convo):
+    with speculate(query) as spec, budget(query), agent_budget():
+        inputs = await asyncio.to_thread(spec.prepare, research_messages(query, convo))
+        raw = await get_research_agent().ainvoke(inputs, config=agent_config())
+        spec.observe(raw["messages"])
+    return finish_research(query, final_text(raw), store=fresh(convo))
+
+
+@traced("research")
+async def arun_research(query: str, session: str | None = None):
+    convo = memory.get(session)
+    cached = cached_answer("research", query, convo)
+    if cached is not None:
+        remember(query, cached, convo)
+        return cached, None
+
+    structured, fallback = await ashared("research", query, convo, lambda: _aresearch(query, convo))
+    remember(query, structured or fallback, convo)
+    return structured, fallback
+
+
+async def answer(query: str, session: str | None = None) -> dict:
+    """Route one query and return a JSON-friendly record (never raises)."""
+    try:
+        if is_research_query(query):
+            structured, fallback = await arun_research(query, session)
+            if structured:
+                return {"query": query, "mode": "research", "result": structured.model_dump()}
+            return {"query": query, "mode": "research", "result": fallback}
+
+        return {"query": query, "mode": "chat", "result": await arun_chat(query, session)}
+    except Exception as e:
+        return {"query": query, "error": str(e)}
+
+
+async def run_batch(queries, concurrency: int = 8) -> list[dict]:
+    """Answer many queries concurrently on the shared clients, in input order."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        async with slots:
+            return await answer(query)
+
+    return await asyncio.gather(*(one(q) for q in queries))
+
+
+# -----------------------------
+# Batch Mode
+# -----------------------------
+def answer_sync(query: str) -> dict:
+    """answer() for callers without an event loop."""
+    try:
+        if is_research_query(query):
+            structured, fallback = run_research(query)
+            if structured:
+                return {"query": query, "mode": "research", "result": structured.model_dump()}
+            return {"query": query, "mode": "research", "result": fallback}
+
+        return {"query": query, "mode": "chat", "result": run_chat(query)}
+    except Exception as e:
+        return {"query": query, "error": str(e)}
+
+
+def batch_items(lines):
+    """(line number, item) for each non-blank line: plain text, or a JSON object with a "query"."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        item = None
+        if line.startswith("{"):
+            try:
+                item = json.loads(line)
+            except ValueError:
+                pass
+        yield number, item if isinstance(item, dict) else {"query": line}
+
+
+def completed_records(path: str) -> int:
+    """Whole lines already in a batch output file; a line torn by a crash is cut off."""
+    if not os.path.exists(path):
+        return 0
+    count, size, last = 0, 0, b"\n"
+    with open(path, "rb+") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            count += block.count(b"\n")
+            size += len(block)
+            last = block[-1:]
+        if last != b"\n":
+            end = size
+            while end > 0:
+                start = max(0, end - (1 << 16))
+                f.seek(start)
+                tail = f.read(end - start).rfind(b"\n")
+                if tail >= 0:
+                    end = start + tail + 1
+                    break
+                end = start
+            f.truncate(end)
+    return count
+
+
+def run_batch_file(lines, out: str, workers: int = 4, progress_every: float = 5.0) -> dict:
+    """Answer a stream of queries on `workers` threads, writing one JSONL record per query.
+
+    Records are written in input order, so the output file doubles as the
+    checkpoint: a rerun with the same input skips as many queries as there
+    are complete lines in `out`. At most `workers * 4` queries are held in
+    memory at once, whatever the input size.
+    """
+    resumed = completed_records(out) if out != "-" else 0
+    items = itertools.islice(batch_items(lines), resumed, None)
+    sink = sys.stdout if out == "-" else open(out, "a", encoding="utf-8")
+    window = deque()
+    stats = {"resumed": resumed, "written": 0, "errors": 0}
+    started = last_report = time.perf_counter()
+
+    def report(final=False):
+        elapsed = time.perf_counter() - started
+        rate = stats["written"] / elapsed if elapsed else 0.0
+        print(
+            f"[batch] {stats['written']} done, {stats['errors']} errors, {resumed} resumed, "
+            f"{rate:.2f} q/s{' (finished)' if final else ''}",
+            file=sys.stderr, flush=True,
+        )
+
+    def write_oldest():
+        nonlocal last_report
+        number, item, future = window.popleft()
+        record = future.result() if future is not None else {"error": "no query"}
+        stats["errors"] += "error" in record
+        stats["written"] += 1
+        sink.write(json.dumps({"line": number, **item, **record}, ensure_ascii=False, default=str) + "\n")
+        sink.flush()
+        if time.perf_counter() - last_report >= progress_every:
+            last_report = time.perf_counter()
+            report()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qai-batch") as pool:
+            for number, item in items:
+                query = str(item.get("query") or "").strip()
+                window.append((number, item, pool.submit(answer_sync, query) if query else None))
+                if len(window) >= workers * 4:
+                    write_oldest()
+            while window:
+                write_oldest()
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+        report(final=True)
+    return stats
 
 
 # -----------------------------
 # CLI Loop
 # -----------------------------
-if __name__ == "__main__":
-    query = input("What can I help you with? ")
+def interactive():
+    # One session for the whole loop, so follow-up questions keep their context
+    session = "cli"
+    while True:
+        try:
+            query = input("\nWhat can I help you with? ").strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if not query:
+            break
 
-    if is_research_query(query):
-        structured, fallback = run_research(query)
+        if is_research_query(query):
+            structured, fallback = None, None
+            for event in stream_research(query, session):
+                if event["type"] == "tool_start":
+                    print(f"[{event['name']}] {event['args']}", flush=True)
+                elif event["type"] == "tool_end":
+                    print(f"[{event['name']}] done", flush=True)
+                elif event["type"] == "final":
+                    structured, fallback = event["structured"], event["fallback"]
 
-        if structured:
-            print("\n--- Structured Research Output ---\n")
-            print("Topic:", structured.topic)
-            print("\nSummary:", structured.summary)
-            print("\nSources:", structured.sources)
-            print("\nTools Used:", structured.tools_used)
+            if structured:
+                print("\n--- Structured Research Output ---\n")
+                print("Topic:", structured.topic)
+                print("\nSummary:", structured.summary)
+                print("\nSources:", structured.sources)
+                print("\nTools Used:", structured.tools_used)
+            else:
+                print("\nAgent Response:\n")
+                print(fallback)
         else:
-            print("\nAgent Response:\n")
-            print(fallback)
+            print("\nQ.AI:\n")
+            for token in stream_chat(query, session):
+                print(token, end="", flush=True)
+            print()
+
+
+if __name__ == "__main__":
+    args = argparse.ArgumentParser(
+        description="Ask Q.AI interactively, or answer a file of queries with --batch.",
+        epilog="Batch input is one query per line, or JSON objects with a \"query\" key (other keys "
+               "are copied to the output). Rerunning with the same --out resumes an interrupted run.",
+    )
+    args.add_argument("--batch", metavar="FILE", help="queries to answer; - for stdin")
+    args.add_argument("--out", default="-", help="JSONL output, also the resume checkpoint (default: stdout)")
+    args.add_argument("--workers", type=int, default=4)
+    opts = args.parse_args()
+
+    from warmup import warmer
+    warmer.start(research=refresh_research)
+    if opts.batch is None:
+        interactive()
+    elif opts.batch == "-":
+        run_batch_file(sys.stdin, opts.out, opts.workers)
     else:
-        response = run_chat(query)
-        print("\nQ.AI:\n")
-        print(response)
\ No newline at end of file
+        with open(opts.batch, encoding="utf-8") as f:
+            run_batch_file(f, opts.out, opts.workers)
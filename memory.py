@@ -0,0 +1,175 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from context import estimate_tokens
+from prompts import MEMORY_SUMMARY
+from tracing import annotate, metrics
+
+# -----------------------------
+# Settings
+# -----------------------------
+WINDOW_TURNS = int(os.getenv("QAI_MEMORY_TURNS", "4"))  # recent turns sent verbatim
+TURN_TOKENS = int(os.getenv("QAI_MEMORY_TURN_TOKENS", "300"))  # per remembered answer
+SUMMARY_TOKENS = int(os.getenv("QAI_MEMORY_SUMMARY_TOKENS", "400"))
+MAX_SOURCES = int(os.getenv("QAI_MEMORY_SOURCES", "20"))
+MAX_SESSIONS = int(os.getenv("QAI_MEMORY_SESSIONS", "256"))
+
+_compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qai-memory")
+counts = {"compactions": 0, "fallbacks": 0, "evicted_sessions": 0}
+
+
+def _clip(text: str, tokens: int) -> str:
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[:tokens * 4].rsplit(" ", 1)[0] + " …"
+
+
+def _summarize(summary: str, turns: list[tuple[str, str]]) -> str:
+    from llms import get_llm  # imported here so memory stays usable without a model
+
+    lines = "\n".join(f"User: {q}\nAssistant: {a}" for q, a in turns)
+    prompt = MEMORY_SUMMARY.format(words=SUMMARY_TOKENS * 3 // 4, summary=summary or "(empty)", turns=lines)
+    return get_llm().invoke(prompt).content.strip()
+
+
+def _extract(summary: str, turns: list[tuple[str, str]]) -> str:
+    """Fallback summary: the question and first sentence of each answer."""
+    lines = [f"{q} -> {a.split('. ', 1)[0]}" for q, a in turns]
+    return "\n".join(filter(None, [summary, *lines]))
+
+
+# -----------------------------
+# One conversation
+# -----------------------------
+class Conversation:
+    """Sliding window of recent turns, a rolling summary of older ones, and sources seen.
+
+    Turns pushed out of the window wait in `_pending` until the background
+    compactor folds them into the summary, so no request waits on it.
+    """
+
+    def __init__(self, window: int = WINDOW_TURNS, summarize=_summarize):
+        self.window = window
+        self.summarize = summarize
+        self.summary = ""
+        self._turns = deque()
+        self._pending = []
+        self._compacting = False
+        self.sources = OrderedDict()  # source -> topic it was found for
+        self.prompt_tokens = deque(maxlen=100)  # memory tokens added to each prompt
+        self._lock = threading.Lock()
+
+    @property
+    def empty(self) -> bool:
+        return not (self._turns or self._pending or self.summary)
+
+    def record(self, query: str, answer: str, sources: list[str] = (), topic: str = ""):
+        with self._lock:
+            self._turns.append((query, _clip(answer, TURN_TOKENS)))
+            while len(self._turns) > self.window:
+                self._pending.append(self._turns.popleft())
+            for source in sources:
+                self.sources.pop(source, None)
+                self.sources[source] = topic
+            while len(self.sources) > MAX_SOURCES:
+                self.sources.popitem(last=False)
+            start = bool(self._pending) and not self._compacting
+            self._compacting = self._compacting or start
+        if start:
+            _compactor.submit(self._compact)
+
+    def _compact(self):
+        while True:
+            with self._lock:
+                turns, self._pending = self._pending, []
+                summary = self.summary
+                if not turns:
+                    self._compacting = False
+                    return
+            try:
+                summary = self.summarize(summary, turns)
+            except Exception:
+                counts["fallbacks"] += 1
+                summary = _extract(summary, turns)
+            with self._lock:
+                self.summary = _clip(summary, SUMMARY_TOKENS)
+            counts["compactions"] += 1
+
+    def context(self) -> str:
+        """Summary, unsummarized turns and known sources as one block of text."""
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+            if self._pending:
+                parts.append("Earlier turns:\n" + "\n".join(f"User: {q}\nAssistant: {a}" for q, a in self._pending))
+            if self.sources:
+                listed = "\n".join(f"- {s} ({t})" if t else f"- {s}" for s, t in self.sources.items())
+                parts.append(f"Sources already found (reuse them instead of searching again):\n{listed}")
+        return "\n\n".join(parts)
+
+    def messages(self, query: str, system: str | None = None) -> list[tuple[str, str]]:
+        """Prompt messages for `query`: system prompt, memory, recent turns, then the query."""
+        messages = [("system", system)] if system else []
+        context = self.context()
+        if context:
+            messages.append(("system", context))
+        with self._lock:
+            for q, a in self._turns:
+                messages.extend([("human", q), ("ai", a)])
+
+        added = sum(estimate_tokens(text) for _, text in messages[1 if system else 0:])
+        self.prompt_tokens.append(added)
+        annotate(memory_tokens=added)
+        messages.append(("human", query))
+        return messages
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": len(self._turns) + len(self._pending),
+                "summary_tokens": estimate_tokens(self.summary),
+                "sources": len(self.sources),
+                "prompt_tokens": list(self.prompt_tokens),
+            }
+
+
+# -----------------------------
+# Sessions
+# -----------------------------
+class Memory:
+    """Conversations by session id; the least recently used are dropped past MAX_SESSIONS."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str | None) -> Conversation | None:
+        if session_id is None:
+            return None
+        with self._lock:
+            convo = self._sessions.pop(session_id, None) or Conversation()
+            self._sessions[session_id] = convo
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                counts["evicted_sessions"] += 1
+            return convo
+
+    def prompt_tokens(self) -> dict:
+        with self._lock:
+            sizes = [c.prompt_tokens[-1] for c in self._sessions.values() if c.prompt_tokens]
+        return {
+            'stat="mean"': sum(sizes) / len(sizes) if sizes else 0,
+            'stat="max"': max(sizes, default=0),
+        }
+
+
+memory = Memory()
+
+metrics.gauges["qai_memory_prompt_tokens"] = memory.prompt_tokens
+metrics.gauges["qai_memory_total"] = lambda: {f'event="{k}"': v for k, v in {**counts, "sessions": len(memory)}.items()}
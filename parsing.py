@@ -0,0 +1,201 @@
+import json
+import re
+from pydantic import BaseModel
+from tracing import span
+
+# -----------------------------
+# Schema for structured research
+# -----------------------------
+class ResearchResponse(BaseModel):
+    topic: str
+    summary: str
+    sources: list[str]
+    tools_used: list[str]
+
+
+class ParseError(ValueError):
+    pass
+
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCT_SPECIAL = re.compile(r'[{}\[\]",:]')
+
+REQUIRED_FIELDS = ("topic", "summary")
+LIST_FIELDS = ("sources", "tools_used")
+
+
+# -----------------------------
+# Incremental parser
+# -----------------------------
+class ResearchStreamParser:
+    """Single-pass parser for a ResearchResponse JSON object in model output.
+
+    Feed it text chunk by chunk. Prose and code fences around the object are
+    skipped, every character is looked at once, and completed fields are
+    returned from feed() as (name, value) pairs as soon as they close:
+    ("topic", str), ("summary", str), ("source", str) per source, and
+    ("tools_used", list).
+    """
+
+    def __init__(self):
+        self.done = False
+        self._reset()
+
+    def _reset(self):
+        self.fields = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key = None
+        self._in_sources = False
+        self._value = None  # parts of the depth-1 value being read
+        self._string = None  # parts of the key or source string being read
+        self._string_role = None
+
+    def _finish_value(self, events) -> bool:
+        text = "".join(self._value).strip()
+        self._value = None
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return False
+
+        key = self._key
+        self.fields[key] = value
+        if key in REQUIRED_FIELDS or key == "tools_used":
+            events.append((key, value))
+        return True
+
+    def _finish_string(self, events) -> bool:
+        try:
+            text = json.loads("".join(self._string))
+        except ValueError:
+            return False
+        finally:
+            self._string = None
+
+        if self._string_role == "key":
+            self._key = text
+            self._expect_key = False
+        else:
+            events.append(("source", text))
+        return True
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        events = []
+        pos, end = 0, len(chunk)
+        value_from = 0 if self._value is not None else None
+        string_from = 0 if self._string is not None else None
+
+        while pos < end and not self.done:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                m = _STRING_SPECIAL.search(chunk, pos)
+                if not m:
+                    break
+                pos = m.end()
+                if m.group() == "\\":
+                    self._escape = True
+                    continue
+
+                self._in_string = False
+                if self._string is not None:
+                    self._string.append(chunk[string_from:pos])
+                    string_from = None
+                    if not self._finish_string(events):
+                        self._reset()
+                        value_from = None
+                continue
+
+            if self._depth == 0:
+                start = chunk.find("{", pos)
+                if start < 0:
+                    break
+                self._depth = 1
+                self._expect_key = True
+                pos = start + 1
+                continue
+
+            m = _STRUCT_SPECIAL.search(chunk, pos)
+            if not m:
+                break
+            at, c = m.start(), m.group()
+            pos = at + 1
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._string_role = "key"
+                elif self._depth == 2 and self._in_sources:
+                    self._string_role = "source"
+                else:
+                    continue
+                self._string = []
+                string_from = at
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 2:
+                    self._in_sources = c == "[" and self._key == "sources"
+            elif c == ":" and self._depth == 1 and self._key is not None and self._value is None:
+                self._value = []
+                value_from = pos
+            elif (c == "," or c == "}") and self._depth == 1:
+                ok = True
+                if self._value is not None:
+                    self._value.append(chunk[value_from:at])
+                    value_from = None
+                    ok = self._finish_value(events)
+                self._key = None
+                self._expect_key = True
+
+                if not ok:
+                    self._reset()
+                elif c == "}":
+                    if self.fields:
+                        self.done = True
+                    else:
+                        self._reset()
+            elif c in "}]":
+                self._depth -= 1
+                self._in_sources = self._in_sources and self._depth >= 2
+
+        if self._value is not None and value_from is not None:
+            self._value.append(chunk[value_from:])
+        if self._string is not None and string_from is not None:
+            self._string.append(chunk[string_from:])
+        return events
+
+    def result(self) -> ResearchResponse:
+        if not self.done:
+            if self._depth:
+                raise ParseError("research JSON object was not closed")
+            raise ParseError("no research JSON object found in model output")
+
+        missing = [f for f in REQUIRED_FIELDS if f not in self.fields]
+        if missing:
+            raise ParseError(f"research JSON is missing {', '.join(missing)}")
+
+        lists = {}
+        for name in LIST_FIELDS:
+            value = self.fields.get(name) or []
+            if not isinstance(value, list):
+                raise ParseError(f"research JSON field {name!r} is not a list")
+            lists[name] = [str(v) for v in value]
+
+        return ResearchResponse(
+            topic=str(self.fields["topic"]),
+            summary=str(self.fields["summary"]),
+            **lists,
+        )
+
+
+def parse_research(text: str) -> ResearchResponse:
+    """Parse complete model output; raises ParseError with the reason on failure."""
+    with span("parse", chars=len(text)):
+        parser = ResearchStreamParser()
+        parser.feed(text)
+        return parser.result()
@@ -0,0 +1,98 @@
+"""Versioned, precomputed prompt templates shared by main.py, app.py and memory.py.
+
+Every entry point sends the same research system prompt byte for byte, first
+in the message list, so the provider can reuse the cached prefix across
+requests. Change a prompt's text only together with its version.
+
+    python prompts.py    # list templates with versions and token counts
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from context import estimate_tokens
+from parsing import ResearchResponse
+from tracing import metrics
+
+# Same text langchain's PydanticOutputParser.get_format_instructions() produces,
+# built from the pydantic schema directly so langchain isn't imported for it
+_FORMAT_INSTRUCTIONS = """The output should be formatted as a JSON instance that conforms to the JSON schema below.
+
+As an example, for the schema {{"properties": {{"foo": {{"title": "Foo", "description": "a list of strings", "type": "array", "items": {{"type": "string"}}}}}}, "required": ["foo"]}}
+the object {{"foo": ["bar", "baz"]}} is a well-formatted instance of the schema. The object {{"properties": {{"foo": ["bar", "baz"]}}}} is not well-formatted.
+
+Here is the output schema:
+```
+{schema}
+```"""
+
+
+def format_instructions(model) -> str:
+    schema = model.model_json_schema()
+    schema.pop("title", None)
+    schema.pop("type", None)
+    return _FORMAT_INSTRUCTIONS.format(schema=json.dumps(schema, ensure_ascii=False))
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+@dataclass(frozen=True)
+class Prompt:
+    name: str
+    version: int
+    text: str  # finished prompt, or a str.format template for templates
+    tokens: int = field(init=False)
+    digest: str = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "tokens", estimate_tokens(self.text))
+        object.__setattr__(self, "digest", hashlib.blake2b(self.text.encode("utf-8"), digest_size=8).hexdigest())
+
+    def format(self, **values) -> str:
+        return self.text.format(**values)
+
+
+_prompts = {}
+PROMPTS = MappingProxyType(_prompts)
+
+
+def register(name: str, version: int, text: str) -> Prompt:
+    if name in _prompts:
+        raise ValueError(f"prompt {name!r} is already registered")
+    prompt = _prompts[name] = Prompt(name, version, text)
+    return prompt
+
+
+metrics.gauges["qai_prompt_tokens"] = lambda: {
+    f'prompt="{p.name}",version="{p.version}"': p.tokens for p in _prompts.values()
+}
+
+
+# -----------------------------
+# Prompts
+# -----------------------------
+RESEARCH = register("research", 2, f"""You are Q.AI, an elite research intelligence system.
+
+If the query requires research:
+- Use tools when necessary.
+- Respond ONLY in valid JSON.
+- Follow this exact schema:
+{format_instructions(ResearchResponse)}
+
+Do not include extra text outside JSON.""")
+
+MEMORY_SUMMARY = register("memory_summary", 1, """Update the running summary of a conversation with the new turns below.
+Keep names, facts and conclusions the user may refer back to; drop pleasantries.
+Reply with the updated summary only, in at most {words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}""")
+
+
+if __name__ == "__main__":
+    for p in PROMPTS.values():
+        print(f"{p.name:<16} v{p.version:<3} {p.tokens:6d} tokens  {p.digest}")
@@ -0,0 +1,298 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import httpx
+from tracing import annotate, metrics
+
+# -----------------------------
+# Settings
+# -----------------------------
+def _settings(name: str, rate: str, burst: str, retries: str, deadline: str) -> dict:
+    prefix = f"QAI_{name.upper()}"
+    return {
+        "rate": float(os.getenv(f"{prefix}_RATE", rate)),  # calls per second, refilled continuously
+        "burst": int(os.getenv(f"{prefix}_BURST", burst)),
+        "retries": int(os.getenv(f"{prefix}_RETRIES", retries)),
+        "deadline": float(os.getenv(f"{prefix}_DEADLINE", deadline)),  # seconds for all attempts
+    }
+
+
+BACKEND_SETTINGS = {
+    "groq": _settings("groq", "0.5", "5", "3", "90"),
+    "search": _settings("search", "1", "3", "2", "30"),
+    "wiki": _settings("wiki", "5", "10", "2", "20"),
+}
+
+BREAKER_FAILURES = int(os.getenv("QAI_BREAKER_FAILURES", "5"))  # consecutive, to open
+BREAKER_RESET = float(os.getenv("QAI_BREAKER_RESET", "30"))  # seconds open before a trial call
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpen(RuntimeError):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable; retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class RetryableResponse(Exception):
+    """An HTTP response worth retrying (rate limited or a server error)."""
+
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Seconds the server asked us to wait, from a Retry-After header if there is one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+# -----------------------------
+# Token bucket
+# -----------------------------
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self) -> float:
+        """Take a token if one is free; otherwise return the seconds until one will be."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def level(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+# -----------------------------
+# Circuit breaker
+# -----------------------------
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures; lets one trial call through after `reset` seconds."""
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset: float = BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> float:
+        """0 if a call may go ahead, else the seconds until the next trial call."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            now = time.monotonic()
+            wait = self._opened_at + self.reset - now
+            if wait <= 0:
+                # This caller is the trial; another gets a turn if it never reports back
+                self.state = self.HALF_OPEN
+                self._opened_at = now
+                return 0.0
+            return max(wait, 1.0)
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._consecutive = 0
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == self.HALF_OPEN or self._consecutive >= self.failures:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+# -----------------------------
+# Guarded backend
+# -----------------------------
+class Backend:
+    """Rate limit, retry with jittered backoff, deadline and circuit breaker for one backend."""
+
+    def __init__(self, name: str, rate: float, burst: int, retries: int, deadline: float):
+        self.name = name
+        self.retries = retries
+        self.deadline = deadline
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+        self.counts = {"ok": 0, "retried": 0, "failed": 0, "rejected": 0, "throttled": 0}
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        hinted = retry_after(error)
+        if hinted is not None:
+            return hinted
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))  # full jitter
+
+    def _admit(self):
+        retry_in = self.breaker.allow()
+        if retry_in:
+            self.counts["rejected"] += 1
+            raise CircuitOpen(self.name, retry_in)
+
+    def _wait(self, deadline: float) -> float:
+        """Take a rate-limit token, or return how long to sleep first; raises once past the deadline."""
+        wait = self.bucket.take()
+        if wait and time.monotonic() + wait > deadline:
+            self.counts["throttled"] += 1
+            raise TimeoutError(f"{self.name} rate limit leaves no time before the deadline")
+        return wait
+
+    def _failed(self, attempt: int, error: BaseException, deadline: float) -> float | None:
+        """Record a failed attempt; return the delay before retrying, or None to give up."""
+        delay = self._backoff(attempt, error)
+        if attempt < self.retries and time.monotonic() + delay < deadline:
+            self.counts["retried"] += 1
+            annotate(retries=attempt + 1)
+            return delay
+        self.counts["failed"] += 1
+        self.breaker.failure()
+        return None
+
+    def _ok(self):
+        self.counts["ok"] += 1
+        self.breaker.success()
+
+    def call(self, fn):
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self._admit()
+            while wait := self._wait(deadline):
+                time.sleep(wait)
+            try:
+                result = fn()
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                delay = self._failed(attempt, e, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._ok()
+            return result
+
+    async def acall(self, fn):
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self._admit()
+            while wait := self._wait(deadline):
+                await asyncio.sleep(wait)
+            try:
+                result = await fn()
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                delay = self._failed(attempt, e, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._ok()
+            return result
+
+
+backends = {name: Backend(name, **settings) for name, settings in BACKEND_SETTINGS.items()}
+
+
+def call(name: str, fn):
+    return backends[name].call(fn)
+
+
+# -----------------------------
+# HTTP transports (Groq client)
+# -----------------------------
+def _unavailable(request: httpx.Request, error: CircuitOpen) -> httpx.Response:
+    # A 503 the SDK turns into a normal API error, with our reason as the message
+    return httpx.Response(
+        503,
+        headers={"retry-after": f"{error.retry_in:.0f}"},
+        json={"error": {"message": str(error), "type": "circuit_open"}},
+        request=request,
+    )
+
+
+def _raise_for_retry(response: httpx.Response) -> httpx.Response:
+    if response.status_code in RETRY_STATUSES:
+        raise RetryableResponse(response)
+    return response
+
+
+class ResilientTransport(httpx.HTTPTransport):
+    def __init__(self, backend: str, **kwargs):
+        super().__init__(**kwargs)
+        self.backend = backends[backend]
+
+    def _send(self, request):
+        response = super().handle_request(request)
+        if response.status_code in RETRY_STATUSES:
+            response.read()  # error bodies are small; keeps the final one readable
+        return _raise_for_retry(response)
+
+    def handle_request(self, request):
+        try:
+            return self.backend.call(lambda: self._send(request))
+        except RetryableResponse as e:
+            return e.response
+        except CircuitOpen as e:
+            return _unavailable(request, e)
+
+
+class AsyncResilientTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, backend: str, **kwargs):
+        super().__init__(**kwargs)
+        self.backend = backends[backend]
+
+    async def _send(self, request):
+        response = await super().handle_async_request(request)
+        if response.status_code in RETRY_STATUSES:
+            await response.aread()
+        return _raise_for_retry(response)
+
+    async def handle_async_request(self, request):
+        try:
+            return await self.backend.acall(lambda: self._send(request))
+        except RetryableResponse as e:
+            return e.response
+        except CircuitOpen as e:
+            return _unavailable(request, e)
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+metrics.gauges["qai_backend_tokens"] = lambda: {f'backend="{n}"': b.bucket.level() for n, b in backends.items()}
+metrics.gauges["qai_backend_circuit_state"] = lambda: {f'backend="{n}"': b.breaker.state for n, b in backends.items()}
+metrics.gauges["qai_backend_calls_total"] = lambda: {
+    f'backend="{n}",outcome="{k}"': v for n, b in backends.items() for k, v in b.counts.items()
+}
@@ -0,0 +1,178 @@
+import contextvars
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from context import bm25, passages, take
+from tracing import annotate, metrics
+
+# -----------------------------
+# Settings
+# -----------------------------
+# Sources the evidence tool fans out to; empty means every tools backend plus the archive
+SOURCES = [s.strip() for s in os.getenv("QAI_EVIDENCE_SOURCES", "").split(",") if s.strip()]
+TIMEOUT = float(os.getenv("QAI_EVIDENCE_TIMEOUT", "15"))  # seconds; slower sources are left out
+RESULTS = int(os.getenv("QAI_EVIDENCE_RESULTS", "8"))  # documents in one bundle
+TOKENS = int(os.getenv("QAI_EVIDENCE_TOKENS", "1200"))  # per bundle, charged to the query budget
+DOC_WORDS = 80  # per document, the passage that best matches the query
+RRF_K = 60  # reciprocal rank fusion constant
+NO_EVIDENCE = "No evidence found."
+
+_URL = re.compile(r"https?://[^\s)\]>,]+")
+_WORD = re.compile(r"\w+")
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="qai-evidence")
+_lock = threading.Lock()
+counts = {}  # (source, "ok" | "failed" | "timeout") -> calls
+merged = {"documents": 0, "duplicates": 0}
+
+metrics.gauges["qai_evidence_source_total"] = lambda: {
+    f'source="{s}",outcome="{o}"': v for (s, o), v in counts.items()
+}
+metrics.gauges["qai_evidence_documents_total"] = lambda: {f'outcome="{k}"': v for k, v in merged.items()}
+
+
+def _count(source: str, outcome: str):
+    with _lock:
+        counts[source, outcome] = counts.get((source, outcome), 0) + 1
+
+
+# -----------------------------
+# Documents
+# -----------------------------
+@dataclass(slots=True)
+class Document:
+    title: str
+    text: str
+    url: str = ""
+    sources: list[str] = field(default_factory=list)
+    score: float = 0.0
+
+    def keys(self) -> list[str]:
+        """A document matching another on either key (same URL, or the same words) is the same document."""
+        words = " ".join(_WORD.findall(self.text.lower()))
+        keys = [hashlib.blake2b(words.encode("utf-8"), digest_size=8).hexdigest()]
+        if self.url:
+            keys.append(self.url.rstrip("/").lower())
+        return keys
+
+
+def _best_passage(text: str, query: str) -> str:
+    chunks = passages(text, DOC_WORDS)
+    if len(chunks) <= 1:
+        return text.strip()
+    scores = bm25(query, chunks)
+    return chunks[max(range(len(chunks)), key=scores.__getitem__)]
+
+
+def wiki_documents(text: str, query: str) -> list[Document]:
+    """One document per page in WikipediaQueryRun's "Page: ...\\nSummary: ..." output."""
+    docs = []
+    for block in re.split(r"\n\n(?=Page: )", text):
+        title, _, summary = block.partition("\nSummary: ")
+        if not title.startswith("Page: ") or not summary.strip():
+            continue
+        title = title[len("Page: "):].strip()
+        url = "https://en.wikipedia.org/wiki/" + title.replace(" ", "_")
+        docs.append(Document(title, _best_passage(summary, query), url))
+    return docs
+
+
+def text_documents(text: str, query: str) -> list[Document]:
+    """Sentence-aligned passages of a plain-text result (DuckDuckGo joins its snippets into one string)."""
+    docs = []
+    for chunk in passages(text, DOC_WORDS):
+        url = _URL.search(chunk)
+        docs.append(Document(chunk[:60].rsplit(" ", 1)[0], chunk, url.group(0) if url else ""))
+    return docs
+
+
+def archive_documents(hits: list[dict], query: str) -> list[Document]:
+    return [
+        Document(f"{h['topic']} ({h['timestamp']})", _best_passage(h["summary"], query))
+        for h in hits
+    ]
+
+
+# -----------------------------
+# Fan-out and fusion
+# -----------------------------
+def gather(query: str, sources: dict, timeout: float = TIMEOUT) -> tuple[dict, dict]:
+    """Run every source on the query at once; returns (documents, errors) keyed by source name.
+
+    Sources still running at the timeout are left out; their results still
+    land in the tool cache for the next query.
+    """
+    futures = {
+        name: _pool.submit(contextvars.copy_context().run, fn, query)
+        for name, fn in sources.items()
+    }
+    done, _ = wait(futures.values(), timeout=timeout)
+    results, errors = {}, {}
+    for name, future in futures.items():
+        if future not in done:
+            future.cancel()
+            errors[name] = "timed out"
+            _count(name, "timeout")
+        elif future.exception() is not None:
+            errors[name] = str(future.exception()) or type(future.exception()).__name__
+            _count(name, "failed")
+        else:
+            results[name] = future.result()
+            _count(name, "ok")
+    return results, errors
+
+
+def fuse(query: str, results: dict) -> list[Document]:
+    """Merge per-source rankings into one, deduplicated by URL or content.
+
+    Reciprocal rank fusion over each source's own order plus a BM25 ranking
+    of all documents against the query, so a document that several sources
+    return, or that matches the query closely, rises to the top.
+    """
+    index, docs, duplicates = {}, [], 0
+    for name, found in results.items():
+        for rank, doc in enumerate(found):
+            keys = doc.keys()
+            kept = next((index[k] for k in keys if k in index), None)
+            if kept is None:
+                kept = doc
+                docs.append(doc)
+            else:
+                duplicates += 1
+                kept.url = kept.url or doc.url
+            for key in kept.keys() + keys:
+                index.setdefault(key, kept)
+            if name not in kept.sources:
+                kept.sources.append(name)
+            kept.score += 1 / (RRF_K + rank + 1)
+
+    scores = bm25(query, [f"{d.title} {d.text}" for d in docs])
+    for rank, i in enumerate(sorted(range(len(docs)), key=scores.__getitem__, reverse=True)):
+        docs[i].score += 1 / (RRF_K + rank + 1)
+    with _lock:
+        merged["documents"] += len(docs)
+        merged["duplicates"] += duplicates
+    return sorted(docs, key=lambda d: d.score, reverse=True)
+
+
+def bundle(query: str, docs: list[Document], errors: dict | None = None,
+           results: int = RESULTS, tokens: int = TOKENS) -> str:
+    """Numbered, source-attributed evidence within the query's context budget."""
+    entries = []
+    for doc in docs[:results]:
+        where = ", ".join(doc.sources) + (f" | {doc.url}" if doc.url else "")
+        entries.append(f"{doc.title} [{where}]\n{doc.text}")
+    chosen = take(entries, tokens)
+    lines = [f"[{n}] {entries[i]}" for n, i in enumerate(chosen, 1)]
+    if errors:
+        lines.append("Unavailable: " + "; ".join(f"{name} ({reason})" for name, reason in errors.items()))
+    annotate(evidence_documents=len(chosen), evidence_candidates=len(docs))
+    return "\n\n".join(lines) if chosen else NO_EVIDENCE + (f"\n{lines[-1]}" if errors else "")
+
+
+def evidence(query: str, sources: dict, timeout: float = TIMEOUT) -> str:
+    results, errors = gather(query, sources, timeout)
+    return bundle(query, fuse(query, results), errors)
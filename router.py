@@ -0,0 +1,184 @@
+"""Query routing: chat, research, or a direct answer from the answer cache.
+
+Evaluate on a labeled file (one "chat|research<TAB>query" per line):
+    python router.py eval benchmarks/router_queries.tsv
+Train the optional classifier on the same format:
+    python router.py train benchmarks/router_queries.tsv
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from typing import NamedTuple
+from answer_cache import answer_cache
+from tracing import span
+
+# -----------------------------
+# Settings
+# -----------------------------
+MODEL_PATH = os.getenv("QAI_ROUTER_MODEL", "router_model.json")
+# Classifier probabilities inside (1 - t, t) are left to the keyword rule
+CONFIDENCE = float(os.getenv("QAI_ROUTER_CONFIDENCE", "0.8"))
+
+RESEARCH_KEYWORDS = [
+    "research", "analyze", "explain", "compare",
+    "history", "impact", "causes", "effects", "statistics",
+    "data", "sources", "study"
+]
+
+def _inflections(word: str) -> set[str]:
+    """The word with its common suffixes, e.g. compare: compares, compared, comparing."""
+    forms = {word, word + "s", word + "es", word + "ed", word + "ing"}
+    if word.endswith("e"):
+        forms |= {word + "d", word[:-1] + "ing"}
+    if word.endswith("y"):
+        forms |= {word[:-1] + "ies", word[:-1] + "ied"}
+    return forms
+
+
+# Whole words and their inflections ("researching", "impacts", "compared"), but
+# not words that merely contain a keyword ("update", "database" for "data")
+_KEYWORDS = re.compile(
+    r"\b(?:" + "|".join(sorted({f for w in RESEARCH_KEYWORDS for f in _inflections(w)}, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def keyword_match(query: str) -> bool:
+    return _KEYWORDS.search(query) is not None
+
+
+# -----------------------------
+# Hashed n-gram classifier
+# -----------------------------
+FEATURES = 2 ** 16
+
+
+def _features(query: str) -> list[int]:
+    words = re.findall(r"\w+", query.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [
+        int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") % FEATURES
+        for g in grams
+    ]
+
+
+class Classifier:
+    """Logistic regression over hashed word unigrams and bigrams."""
+
+    def __init__(self, weights: dict[int, float] | None = None, bias: float = 0.0):
+        self.weights = weights or {}
+        self.bias = bias
+
+    def probability(self, query: str) -> float:
+        z = self.bias + sum(self.weights.get(f, 0.0) for f in _features(query))
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def train(self, examples: list[tuple[str, bool]], epochs: int = 20, rate: float = 0.5):
+        for _ in range(epochs):
+            for query, research in examples:
+                error = float(research) - self.probability(query)
+                self.bias += rate * error
+                for f in _features(query):
+                    self.weights[f] = self.weights.get(f, 0.0) + rate * error
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"bias": self.bias, "weights": self.weights}, f)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls({int(k): v for k, v in data["weights"].items()}, data["bias"])
+
+
+classifier = Classifier.load(MODEL_PATH) if os.path.exists(MODEL_PATH) else None
+
+
+# -----------------------------
+# Router
+# -----------------------------
+class Route(NamedTuple):
+    name: str  # "chat", "research" or "cache"
+    research: bool
+    answer: object = None  # cached reply or ResearchResponse when name == "cache"
+
+
+def is_research_query(query: str) -> bool:
+    if classifier is not None:
+        p = classifier.probability(query)
+        if p >= CONFIDENCE:
+            return True
+        if p <= 1.0 - CONFIDENCE:
+            return False
+    return keyword_match(query)
+
+
+def route(query: str, use_cache: bool = True) -> Route:
+    with span("route") as attrs:
+        research = is_research_query(query)
+        mode = "research" if research else "chat"
+        cached, _ = answer_cache.lookup(mode, query) if use_cache else (None, 0.0)
+        attrs["route"] = "cache" if cached is not None else mode
+        if cached is not None:
+            return Route("cache", research, cached)
+        return Route(mode, research)
+
+
+# -----------------------------
+# Offline evaluation
+# -----------------------------
+def _legacy_is_research(query: str) -> bool:
+    return any(word in query.lower() for word in RESEARCH_KEYWORDS)
+
+
+def load_labels(path: str) -> list[tuple[str, bool]]:
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            label, query = line.split("\t", 1)
+            examples.append((query, label == "research"))
+    return examples
+
+
+def evaluate(examples: list[tuple[str, bool]], predict=is_research_query) -> dict:
+    tp = fp = tn = fn = 0
+    for query, research in examples:
+        predicted = predict(query)
+        if predicted and research:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif research:
+            fn += 1
+        else:
+            tn += 1
+    return {
+        "accuracy": (tp + tn) / len(examples) if examples else 0.0,
+        "false_positives": fp,  # each one is a wasted agent run
+        "false_negatives": fn,
+        "agent_runs": tp + fp,
+    }
+
+
+if __name__ == "__main__":
+    command, path = sys.argv[1], sys.argv[2]
+    examples = load_labels(path)
+
+    if command == "train":
+        model = Classifier()
+        model.train(examples)
+        model.save(MODEL_PATH)
+        print(f"Saved {MODEL_PATH}:", evaluate(examples, lambda q: model.probability(q) >= 0.5))
+    else:
+        legacy = evaluate(examples, _legacy_is_research)
+        current = evaluate(examples)
+        print("legacy substring:", legacy)
+        print("router:          ", current)
+        print("wasted agent runs avoided:", legacy["false_positives"] - current["false_positives"])
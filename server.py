@@ -0,0 +1,238 @@
+"""Headless HTTP/JSON API in front of a pool of worker processes.
+
+    python server.py --port 8765 --workers 4 --queue 64
+
+POST /jobs      {"query": "...", "deadline": 60}  -> 202 {"id": ...} or 429 when full
+GET  /jobs/<id>                                   -> {"status": ..., "result"/"error"}
+GET  /health                                      -> pool and queue stats
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+import urllib.request
+import urllib.error
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -----------------------------
+# Settings
+# -----------------------------
+DEFAULT_DEADLINE = float(os.getenv("QAI_JOB_DEADLINE", "120"))
+RESULT_TTL = float(os.getenv("QAI_RESULT_TTL", "600"))
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+def _init_worker():
+    # Build clients and the agent once per process, not per job
+    import main
+    main.get_chat_llm()
+    main.get_research_agent()
+
+
+def _work(query: str, deadline: float) -> dict:
+    if time.time() > deadline:
+        return {"query": query, "error": "deadline exceeded before start"}
+    import main
+    # Not asyncio.run(main.answer(...)): the worker's shared async HTTP client
+    # keeps connections bound to the first job's loop, which each run closes
+    return main.answer_sync(query)
+
+
+# -----------------------------
+# Job queue and result store
+# -----------------------------
+class JobQueue:
+    """Bounded queue over a process pool; results are kept for RESULT_TTL seconds."""
+
+    def __init__(self, workers: int, capacity: int):
+        self.workers = workers
+        self.capacity = capacity
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self._slots = threading.BoundedSemaphore(workers + capacity)
+        self._lock = threading.Lock()
+        self._jobs = {}  # id -> {"status", "deadline", "finished_at", "result"/"error"}
+        self.rejected = 0
+        self.completed = 0
+        self.expired = 0
+
+    def submit(self, query: str, deadline_seconds: float = DEFAULT_DEADLINE) -> str | None:
+        """Queue a job; returns None when the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+
+        job_id = uuid.uuid4().hex
+        deadline = time.time() + deadline_seconds
+        with self._lock:
+            self._jobs[job_id] = {"status": "queued", "deadline": deadline}
+        future = self._pool.submit(_work, query, deadline)
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id: str, future):
+        self._slots.release()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["finished_at"] = time.time()
+            if job["finished_at"] > job["deadline"]:
+                job.update(status="expired", error="deadline exceeded")
+                self.expired += 1
+                return
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"error": str(e)}
+            job.update(status="error" if "error" in record else "done", **record)
+            self.completed += 1
+
+    def get(self, job_id: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued" and now > job["deadline"]:
+                job["status"] = "expired"
+            return {k: v for k, v in job.items() if k not in ("deadline", "finished_at")}
+
+    def _expire(self, now: float):
+        stale = [i for i, j in self._jobs.items() if now - j.get("finished_at", now) > RESULT_TTL]
+        for job_id in stale:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = sum(1 for j in self._jobs.values() if j["status"] == "queued")
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "in_flight": in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "expired": self.expired,
+            }
+
+
+# -----------------------------
+# HTTP API
+# -----------------------------
+def make_handler(jobs: JobQueue):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict, headers: dict | None = None):
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                return self._send(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                query = str(payload["query"]).strip()
+            except (ValueError, KeyError, TypeError):
+                return self._send(400, {"error": "expected JSON body with a 'query'"})
+            if not query:
+                return self._send(400, {"error": "query is empty"})
+            try:
+                deadline = float(payload.get("deadline", DEFAULT_DEADLINE))
+            except (ValueError, TypeError):
+                deadline = math.nan
+            if not math.isfinite(deadline) or deadline <= 0:
+                return self._send(400, {"error": "deadline must be a positive number of seconds"})
+
+            job_id = jobs.submit(query, deadline)
+            if job_id is None:
+                return self._send(429, {"error": "queue full"}, {"Retry-After": "1"})
+            self._send(202, {"id": job_id})
+
+        def do_GET(self):
+            if self.path == "/health":
+                return self._send(200, jobs.stats())
+            if self.path.startswith("/jobs/"):
+                job = jobs.get(self.path[len("/jobs/"):])
+                if job is None:
+                    return self._send(404, {"error": "unknown job"})
+                return self._send(200, job)
+            self._send(404, {"error": "not found"})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+# -----------------------------
+# Client helpers (used by app.py)
+# -----------------------------
+def _request(url: str, data: dict | None = None) -> dict:
+    body = None if data is None else json.dumps(data).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.loads(resp.read())
+
+
+def _retry_after(error: urllib.error.HTTPError) -> float:
+    try:
+        return max(0.0, float(error.headers.get("Retry-After", "1")))
+    except ValueError:  # an HTTP date; the server only sends seconds
+        return 1.0
+
+
+def ask(server_url: str, query: str, deadline: float = DEFAULT_DEADLINE, poll_interval: float = 0.25) -> dict:
+    """Submit a query and poll until it finishes; returns the job record.
+
+    While the server's queue is full (429) the submit is retried after its
+    Retry-After delay, until the job's deadline has passed.
+    """
+    give_up = time.monotonic() + deadline
+    while True:
+        remaining = give_up - time.monotonic()
+        try:
+            job_id = _request(f"{server_url}/jobs", {"query": query, "deadline": remaining})["id"]
+            break
+        except urllib.error.HTTPError as e:
+            if e.code != 429:
+                raise
+            wait = _retry_after(e)
+            if wait >= remaining:
+                return {"query": query, "status": "error",
+                        "error": f"server busy: queue still full after {deadline:.0f}s, try again later"}
+            time.sleep(wait)
+    while True:
+        job = _request(f"{server_url}/jobs/{job_id}")
+        if job["status"] not in ("queued",):
+            return job
+        time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument("--host", default="127.0.0.1")
+    args.add_argument("--port", type=int, default=8765)
+    args.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args.add_argument("--queue", type=int, default=64, help="jobs allowed to wait beyond the running ones")
+    opts = args.parse_args()
+
+    jobs = JobQueue(opts.workers, opts.queue)
+    server = ThreadingHTTPServer((opts.host, opts.port), make_handler(jobs))
+    print(f"Serving on http://{opts.host}:{opts.port} with {opts.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,117 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from cache import normalize_query
+from context import NO_NEW_INFORMATION, fit
+from tracing import metrics
+
+# -----------------------------
+# Settings
+# -----------------------------
+# off    -- no prefetch
+# serve  -- prefetch into the tool cache; the model's matching call is served from it
+# inject -- also wait briefly and put the prefetched text in the first prompt
+MODE = os.getenv("QAI_SPECULATIVE", "off")
+INJECT_WAIT = float(os.getenv("QAI_SPECULATIVE_WAIT", "3"))
+
+# Prefetched backends each agent tool reads (evidence_tool fans out to all of them)
+TOOL_KINDS = {"search_tool": ("search",), "wikipedia": ("wiki",), "evidence_tool": ("search", "wiki")}
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qai-speculate")
+_lock = threading.Lock()
+counts = {"started": 0, "used": 0, "injected": 0, "wasted": 0, "cancelled": 0, "failed": 0}
+
+metrics.gauges["qai_speculation_total"] = lambda: {f'outcome="{k}"': v for k, v in counts.items()}
+
+
+def _fetch(kind: str, query: str) -> str:
+    from tools import fetch  # tools loads langchain; only pay for it when prefetching
+    return fetch(kind, query)
+
+
+def _count(key: str, n: int = 1):
+    with _lock:
+        counts[key] += n
+
+
+# -----------------------------
+# Speculation for one query
+# -----------------------------
+class Speculation:
+    """Starts search and Wikipedia lookups for the raw query before the first LLM step."""
+
+    def __init__(self, query: str, mode: str = MODE):
+        self.query = query
+        self.mode = mode
+        self._requested = set()
+        self._futures = {}
+        if mode != "off":
+            for kind in ("search", "wiki"):
+                self._futures[kind] = _pool.submit(_fetch, kind, query)
+            _count("started", len(self._futures))
+
+    def prepare(self, inputs: dict) -> dict:
+        """In inject mode, add whatever was prefetched in time to the agent's first prompt.
+
+        Each result goes through the query's context budget like a tool result.
+        """
+        if self.mode != "inject" or not self._futures:
+            return inputs
+
+        done, _ = wait(self._futures.values(), timeout=INJECT_WAIT)
+        evidence = []
+        for kind, future in self._futures.items():
+            if future in done and future.exception() is None:
+                text = fit(future.result(), self.query)
+                if text == NO_NEW_INFORMATION:
+                    continue
+                evidence.append(f"[{kind}] {text}")
+                self._requested.add(kind)
+                _count("injected")
+        if not evidence:
+            return inputs
+
+        note = (
+            "Background lookups already run for the user's query. Use them if they are "
+            "enough, and only call tools for anything missing:\n\n" + "\n\n".join(evidence)
+        )
+        messages = list(inputs["messages"])
+        messages.insert(1, ("system", note))
+        return {**inputs, "messages": messages}
+
+    def requested(self, tool_name: str, args: dict):
+        """Note a tool call the model made; a match means the prefetch was used."""
+        query = args.get("query") if isinstance(args, dict) else None
+        if not query or normalize_query(query) != normalize_query(self.query):
+            return
+        for kind in TOOL_KINDS.get(tool_name, ()):
+            if kind in self._futures:
+                self._requested.add(kind)
+
+    def observe(self, messages):
+        for msg in messages:
+            for call in getattr(msg, "tool_calls", None) or []:
+                self.requested(call["name"], call["args"])
+
+    def finish(self):
+        for kind, future in self._futures.items():
+            if future.cancel():
+                _count("cancelled")
+            elif future.done() and future.exception() is not None:
+                _count("failed")
+            elif kind in self._requested:
+                _count("used")
+            else:
+                _count("wasted")
+        self._futures = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+        return False
+
+
+def speculate(query: str) -> Speculation:
+    return Speculation(query)
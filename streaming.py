@@ -0,0 +1,47 @@
+from parsing import ResearchStreamParser
+
+
+def stream_agent(agent, inputs, config=None):
+    """Run a ReAct agent and yield UI events as they happen.
+
+    Events are dicts with a "type" of:
+      token      -- {"text"}: a piece of model output
+      tool_start -- {"name", "args"}: the model asked for a tool
+      tool_end   -- {"name", "content"}: a tool returned
+      fields     -- {"fields"}: research JSON fields completed so far
+      final      -- {"text"}: content of the last AI message
+    """
+    message_id, parser, fields = None, None, {}
+    final_text = None
+
+    for mode, payload in agent.stream(inputs, config=config, stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            chunk, meta = payload
+            if meta.get("langgraph_node") != "agent" or not isinstance(chunk.content, str) or not chunk.content:
+                continue
+            if chunk.id != message_id:
+                message_id, parser, fields = chunk.id, ResearchStreamParser(), {}
+
+            yield {"type": "token", "text": chunk.content}
+
+            completed = parser.feed(chunk.content)
+            for name, value in completed:
+                if name == "source":
+                    fields.setdefault("sources", []).append(value)
+                else:
+                    fields[name] = value
+            if completed:
+                yield {"type": "fields", "fields": dict(fields)}
+            continue
+
+        for node, update in payload.items():
+            for msg in (update or {}).get("messages", []):
+                if node == "agent" and msg.type == "ai":
+                    for call in msg.tool_calls:
+                        yield {"type": "tool_start", "name": call["name"], "args": call["args"]}
+                    if not msg.tool_calls:
+                        final_text = msg.content
+                elif node == "tools" and msg.type == "tool":
+                    yield {"type": "tool_end", "name": msg.name, "content": msg.content}
+
+    yield {"type": "final", "text": final_text}
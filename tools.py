@@ -1,22 +1,165 @@
-from langchain_community.tools import WikipediaQueryRun, DuckDuckGoSearchRun
-from langchain_community.utilities import WikipediaAPIWrapper
+import functools
 from langchain_core.tools import tool
-from datetime import datetime
+from cache import ToolCache
+from concurrency import limiter, TOOL_LIMITS
+from writer import writer, TEXT_PATH
+from archive import archive
+from tracing import span, annotate
+from context import fit
+from resilience import call
+from agent_budget import forget, repeated
+import retrieval
+from warmup import warmer
+
+cache = ToolCache()
+
+WIKIPEDIA_NAME = "wikipedia"
+WIKIPEDIA_DESCRIPTION = (
+    "A wrapper around Wikipedia. Useful for when you need to answer general questions about "
+    "people, places, companies, facts, historical events, or other subjects. "
+    "Input should be a search query."
+)
+
+# Backend wrappers are built once, on first use, so importing this module
+# doesn't load langchain_community or the search/Wikipedia clients.
+@functools.cache
+def _wikipedia():
+    from langchain_community.tools import WikipediaQueryRun
+    from langchain_community.utilities import WikipediaAPIWrapper
+    # Fetch more than the model needs; context.fit trims each result to the query's budget
+    api_wrapper = WikipediaAPIWrapper(top_k_results=3, doc_content_chars_max=4000)
+    return WikipediaQueryRun(api_wrapper=api_wrapper)
+
+@functools.cache
+def _duckduckgo():
+    from langchain_community.tools import DuckDuckGoSearchRun
+    return DuckDuckGoSearchRun()
+
+def duckduckgo(query: str) -> str:
+    return _duckduckgo().run(query)
+
+def wikipedia(query: str) -> str:
+    return _wikipedia().run(query)
+
+# Network calls behind the tools; benchmarks swap in local stand-ins here
+backends = {"search": duckduckgo, "wiki": wikipedia}
+
+def _guarded(kind: str, query: str) -> str:
+    if kind not in TOOL_LIMITS:
+        return backends[kind](query)  # a local stand-in: no rate limits or circuit to guard
+    return call(kind, lambda: limiter.run(kind, lambda: backends[kind](query)))
+
+def _expired(kind: str, query: str) -> bool:
+    age, ttl = cache.age(kind, query), cache.ttls.get(kind)
+    return age is not None and ttl is not None and age >= ttl
+
+def fetch(kind: str, query: str) -> str:
+    """Cached, rate-limited backend call shared by the tools and speculative prefetch.
+
+    When the backend fails or its circuit is open, an expired cache entry is
+    served instead if there is one. Hot topics (warmup.py) get their expired
+    entry straight away while the warm-up thread fetches a fresh one.
+    """
+    if warmer.hot(query) and _expired(kind, query):
+        stale = cache.stale(kind, query)
+        if stale is not None:
+            annotate(cache_hit=True, stale=True)
+            warmer.revalidate(kind, query)
+            return stale
+
+    try:
+        return cache.fetch(kind, query, lambda: _guarded(kind, query))
+    except Exception:
+        stale = cache.stale(kind, query)
+        if stale is None:
+            raise
+        annotate(stale=True)
+        return stale
+
+def refresh(kind: str, query: str) -> str:
+    """Fetch and cache a fresh result whatever the cache holds (warm-up)."""
+    return cache.refresh(kind, query, lambda: _guarded(kind, query))
 
 @tool
 def search_tool(query: str) -> str:
     """Search the web for information."""
-    search = DuckDuckGoSearchRun()
-    return search.run(query)
+    with span("tool:search", query_chars=len(query)) as attrs:
+        previous = repeated("search", query)
+        if previous is not None:
+            attrs["duplicate"] = True
+            return f"Skipped: this repeats the earlier search for {previous!r}. Use that result or answer now."
+        try:
+            result = fit(fetch("search", query), query)
+        except Exception as e:
+            forget("search", query)
+            attrs["error"] = type(e).__name__
+            return f"Search failed: {e}"
+        attrs["result_chars"] = len(result)
+        return result
 
 @tool
 def save_tool(data: str) -> str:
     """Saves structured research data to a text file."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    formatted_text = f"--- Research Output ---\nTimestamp: {timestamp}\n\n{data}\n\n"
-    with open("research_output.txt", "a", encoding="utf-8") as f:
-        f.write(formatted_text)
-    return f"Data successfully saved to research_output.txt"
-
-api_wrapper = WikipediaAPIWrapper(top_k_results=1, doc_content_chars_max=100)
-wiki_tool = WikipediaQueryRun(api_wrapper=api_wrapper)
\ No newline at end of file
+    with span("tool:save", data_chars=len(data)):
+        writer.write(data)
+    return f"Data successfully saved to {TEXT_PATH}"
+
+@tool
+def archive_tool(query: str) -> str:
+    """Search research saved in earlier sessions. Try this before searching the web."""
+    with span("tool:archive", query_chars=len(query)) as attrs:
+        hits = archive.search(query, limit=3) if archive is not None else []
+        attrs["hits"] = len(hits)
+    if not hits:
+        return "No saved research found."
+    return "\n\n".join(
+        f"{h['topic']} ({h['timestamp']}): {h['summary'][:500]}\nSources: {', '.join(h['sources'])}"
+        for h in hits
+    )
+
+@tool(WIKIPEDIA_NAME, description=WIKIPEDIA_DESCRIPTION)
+def wiki_tool(query: str) -> str:
+    with span("tool:wiki", query_chars=len(query)) as attrs:
+        previous = repeated("wiki", query)
+        if previous is not None:
+            attrs["duplicate"] = True
+            return f"Skipped: this repeats the earlier Wikipedia lookup for {previous!r}. Use that result or answer now."
+        try:
+            result = fit(fetch("wiki", query), query)
+        except Exception as e:
+            forget("wiki", query)
+            attrs["error"] = type(e).__name__
+            return f"Wikipedia lookup failed: {e}"
+        attrs["result_chars"] = len(result)
+        return result
+
+def evidence_sources() -> dict:
+    """What evidence_tool fans out to: each backend's results split into documents, plus the archive."""
+    parse = {"wiki": retrieval.wiki_documents}
+    sources = {
+        kind: lambda q, kind=kind: parse.get(kind, retrieval.text_documents)(fetch(kind, q), q)
+        for kind in backends
+    }
+    if archive is not None:
+        sources["archive"] = lambda q: retrieval.archive_documents(archive.search(q, limit=3), q)
+    if retrieval.SOURCES:
+        sources = {name: fn for name, fn in sources.items() if name in retrieval.SOURCES}
+    return sources
+
+@tool
+def evidence_tool(query: str) -> str:
+    """Search the web, Wikipedia and saved research at once. Returns merged, deduplicated
+    evidence with its sources. Prefer this over separate searches."""
+    with span("tool:evidence", query_chars=len(query)) as attrs:
+        previous = repeated("evidence", query)
+        if previous is not None:
+            attrs["duplicate"] = True
+            return f"Skipped: this repeats the earlier evidence search for {previous!r}. Use that result or answer now."
+        result = retrieval.evidence(query, evidence_sources())
+        if result.startswith(retrieval.NO_EVIDENCE):
+            forget("evidence", query)  # every source failed or came back empty; a retry may do better
+        attrs["result_chars"] = len(result)
+        return result
+
+# Tools given to the research agent, in the order the model sees them
+research_tools = [evidence_tool, archive_tool, search_tool, wiki_tool, save_tool]
@@ -0,0 +1,277 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.callbacks import BaseCallbackHandler
+
+# -----------------------------
+# Settings
+# -----------------------------
+RING_SIZE = int(os.getenv("QAI_TRACE_RING", "2000"))
+JSONL_PATH = os.getenv("QAI_TRACE_JSONL")  # optional span log
+PROMETHEUS_PORT = os.getenv("QAI_TRACE_PROM_PORT")  # optional /metrics endpoint
+
+_current = contextvars.ContextVar("qai_span", default=None)  # attrs of the innermost span
+_trace = contextvars.ContextVar("qai_trace", default=None)  # spans of the current query
+_in_flight = {}  # mode -> top-level queries running now
+_in_flight_lock = threading.Lock()
+
+
+# -----------------------------
+# Sinks
+# -----------------------------
+class RingBufferSink:
+    def __init__(self, size: int = RING_SIZE):
+        self.spans = deque(maxlen=size)
+
+    def emit(self, record: dict):
+        self.spans.append(record)
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def emit(self, record: dict):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+class PrometheusSink:
+    """Aggregates spans into counters and renders the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = {}
+        self._seconds = {}
+        self._errors = {}
+        self._cache_hits = {}
+        self.gauges = {}  # name -> callable returning {labels: value}; used by other modules
+
+    def emit(self, record: dict):
+        name = record["name"]
+        with self._lock:
+            self._count[name] = self._count.get(name, 0) + 1
+            self._seconds[name] = self._seconds.get(name, 0.0) + record["duration_ms"] / 1000
+            if "error" in record:
+                self._errors[name] = self._errors.get(name, 0) + 1
+            if record.get("cache_hit"):
+                self._cache_hits[name] = self._cache_hits.get(name, 0) + 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for metric, values in (
+                ("qai_span_total", self._count),
+                ("qai_span_seconds_total", self._seconds),
+                ("qai_span_errors_total", self._errors),
+                ("qai_span_cache_hits_total", self._cache_hits),
+            ):
+                lines.append(f"# TYPE {metric} counter")
+                lines.extend(f'{metric}{{span="{name}"}} {value}' for name, value in sorted(values.items()))
+        for metric, collect in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in sorted(collect().items()):
+                lines.append(f"{metric}{{{labels}}} {value}" if labels else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, name="qai-metrics", daemon=True).start()
+        return server
+
+
+# -----------------------------
+# Tracer
+# -----------------------------
+class Tracer:
+    def __init__(self, sinks: list):
+        self.sinks = sinks
+
+    def record(self, name: str, duration: float, attrs: dict):
+        record = {"name": name, "ts": time.time() - duration, "duration_ms": duration * 1000, **attrs}
+        spans = _trace.get()
+        if spans is not None:
+            spans.append(record)
+        for sink in self.sinks:
+            sink.emit(record)
+
+
+ring = RingBufferSink()
+metrics = PrometheusSink()
+tracer = Tracer([ring, metrics] + ([JsonlSink(JSONL_PATH)] if JSONL_PATH else []))
+if PROMETHEUS_PORT:
+    metrics.serve(int(PROMETHEUS_PORT))
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block; the yielded dict (and annotate()) add attributes to the span."""
+    token = _current.set(attrs)
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        tracer.record(name, time.perf_counter() - start, attrs)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.update(attrs)
+
+
+def _track(mode: str, delta: int):
+    with _in_flight_lock:
+        _in_flight[mode] = _in_flight.get(mode, 0) + delta
+
+
+def in_flight(exclude: tuple = ()) -> int:
+    """Top-level queries running now, not counting the given modes."""
+    with _in_flight_lock:
+        return sum(n for mode, n in _in_flight.items() if mode not in exclude)
+
+
+metrics.gauges["qai_queries_in_flight"] = lambda: {f'mode="{m}"': n for m, n in _in_flight.items()}
+
+
+@contextmanager
+def trace(mode: str, query: str | None = None):
+    """Collect every span of one query; nested calls join the outer query.
+
+    The query text is kept on the top-level span, so the ring buffer and the
+    JSONL log double as a request log (see warmup.py).
+    """
+    spans = _trace.get()
+    token = None
+    attrs = {"mode": mode}
+    if spans is None:
+        spans = []
+        token = _trace.set(spans)
+        _track(mode, 1)
+        if query:
+            attrs["query"] = query
+    try:
+        with span("query", **attrs):
+            yield spans
+    finally:
+        if token is not None:
+            _track(mode, -1)
+            try:
+                _trace.reset(token)
+            except ValueError:
+                _trace.set(None)
+
+
+def traced(mode: str):
+    """Decorator form of trace() for plain, async and generator functions.
+
+    A str first argument is taken to be the query.
+    """
+
+    def first(args):
+        return args[0] if args and isinstance(args[0], str) else None
+
+    def wrap(fn):
+        if inspect.isasyncgenfunction(fn):
+            raise TypeError("traced() does not support async generators")
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                with trace(mode, first(args)):
+                    return await fn(*args, **kwargs)
+            return run_async
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def run_gen(*args, **kwargs):
+                with trace(mode, first(args)):
+                    yield from fn(*args, **kwargs)
+            return run_gen
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with trace(mode, first(args)):
+                return fn(*args, **kwargs)
+        return run
+
+    return wrap
+
+
+def breakdown(spans: list[dict]) -> str:
+    """One-line per-query summary, e.g. 'llm 2×830ms · tool:search 420ms (1 cached)'."""
+    totals = {}
+    for s in spans:
+        entry = totals.setdefault(s["name"], [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += s["duration_ms"]
+        entry[2] += 1 if s.get("cache_hit") else 0
+
+    parts = []
+    for name, (count, ms, hits) in totals.items():
+        text = f"{name} {count}×{ms / count:.0f}ms" if count > 1 else f"{name} {ms:.0f}ms"
+        if hits:
+            text += f" ({hits} cached)"
+        parts.append(text)
+    return " · ".join(parts)
+
+
+# -----------------------------
+# LangChain callback for LLM calls
+# -----------------------------
+class LLMTracer(BaseCallbackHandler):
+    """Records an "llm" span per model call with payload size and token counts."""
+
+    def __init__(self):
+        self._starts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._starts[run_id] = (time.perf_counter(), chars)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start, chars = self._starts.pop(run_id, (time.perf_counter(), 0))
+        attrs = {"prompt_chars": chars}
+
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            attrs["input_tokens"] = usage.get("input_tokens")
+            attrs["output_tokens"] = usage.get("output_tokens")
+        if generation is not None:
+            attrs["output_chars"] = len(generation.text or "")
+        tracer.record("llm", time.perf_counter() - start, attrs)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        start, chars = self._starts.pop(run_id, (time.perf_counter(), 0))
+        tracer.record("llm", time.perf_counter() - start, {"prompt_chars": chars, "error": type(error).__name__})
+
+
+llm_tracer = LLMTracer()
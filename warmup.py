@@ -0,0 +1,272 @@
+"""Background warm-up of the tool and answer caches for frequently asked topics.
+
+Topics are mined from saved research (the archive) and the request log (the
+"query" spans of the trace ring buffer, or QAI_TRACE_JSONL when it is set),
+scored by frequency with a recency half-life. A single low-priority thread
+then pre-runs search and Wikipedia for them, and in research mode the full
+agent for the top few, refreshing each entry before its TTL runs out. It
+waits while live queries are running or a backend's rate limit is below its
+reserve, and makes at most QAI_WARMUP_CALLS calls per pass.
+
+Live lookups of a hot topic whose cache entry has expired get the old value
+at once while the warm-up thread refetches it (stale-while-revalidate).
+
+    python warmup.py        # list the topics warm-up would keep warm
+    python warmup.py run    # one warm-up pass now, then exit
+"""
+import itertools
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from archive import archive
+from cache import normalize_query
+from resilience import backends
+from tracing import JSONL_PATH, in_flight, metrics, ring, span
+
+# -----------------------------
+# Settings
+# -----------------------------
+# off      -- no warm-up
+# tools    -- keep search and Wikipedia results for hot topics fresh
+# research -- also keep full research answers for the top topics in the answer cache
+MODE = os.getenv("QAI_WARMUP", "off")
+TOPICS = int(os.getenv("QAI_WARMUP_TOPICS", "20"))
+RESEARCH_TOPICS = int(os.getenv("QAI_WARMUP_RESEARCH_TOPICS", "5"))
+INTERVAL = float(os.getenv("QAI_WARMUP_INTERVAL", "300"))  # seconds between passes
+REFRESH_AHEAD = float(os.getenv("QAI_WARMUP_REFRESH_AHEAD", "0.8"))  # refresh at this share of the TTL
+MAX_CALLS = int(os.getenv("QAI_WARMUP_CALLS", "40"))  # tool or research runs per pass
+MAX_LIVE = int(os.getenv("QAI_WARMUP_MAX_LIVE", "0"))  # live queries above which warm-up waits
+RESERVE = float(os.getenv("QAI_WARMUP_RESERVE", "0.5"))  # share of each rate-limit burst left to live traffic
+HALF_LIFE = float(os.getenv("QAI_WARMUP_HALF_LIFE", "86400"))  # seconds for a past query to count half
+ARCHIVE_ROWS = 1000
+LOG_LINES = 20000
+MAX_WORDS = 12  # longer "topics" are usually a saved answer's first line
+
+TOOL_KINDS = ("search", "wiki")
+BACKEND = {"search": "search", "wiki": "wiki", "research": "groq"}  # resilience backend each task draws on
+
+
+# -----------------------------
+# Topic mining
+# -----------------------------
+def _timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def _log_records():
+    """Recent "query" spans from the JSONL trace log, or this process's ring buffer."""
+    if not JSONL_PATH:
+        return list(ring.spans)
+    if not os.path.exists(JSONL_PATH):
+        return []
+    records = []
+    with open(JSONL_PATH, encoding="utf-8") as f:
+        for line in deque(f, maxlen=LOG_LINES):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def mine(limit: int = TOPICS, now: float | None = None) -> list[tuple[str, float]]:
+    """The most asked-about topics as (query, score), best first.
+
+    Each past occurrence counts 1, halved every HALF_LIFE seconds of age.
+    """
+    now = now or time.time()
+    scores = {}  # normalized -> [score, query as first seen]
+
+    def add(query: str, ts):
+        if not query or len(query.split()) > MAX_WORDS:
+            return
+        entry = scores.setdefault(normalize_query(query), [0.0, query.strip()])
+        entry[0] += math.exp(-math.log(2) * max(0.0, now - _timestamp(ts)) / HALF_LIFE)
+
+    if archive is not None:
+        for row in archive.recent(ARCHIVE_ROWS):
+            add(row["topic"], row["timestamp"])
+    for record in _log_records():
+        # Chat never calls tools, and warm-up's own runs would feed back into the ranking
+        if record.get("name") == "query" and record.get("mode") not in ("chat", "warmup"):
+            add(record.get("query"), record.get("ts"))
+
+    ranked = sorted(scores.values(), key=lambda e: e[0], reverse=True)
+    return [(query, score) for score, query in ranked[:limit]]
+
+
+# -----------------------------
+# Scheduler
+# -----------------------------
+class Warmer:
+    """One background thread that keeps hot topics warm without crowding out live queries."""
+
+    def __init__(self, mode: str = MODE):
+        self.mode = mode
+        self.topics = []  # (query, score) from the last pass
+        self._hot = frozenset()
+        self._queue = queue.PriorityQueue()  # (priority, seq, kind, query); revalidations first
+        self._queued = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._research = None  # callable(query) that runs and caches full research
+        self._calls = 0
+        self.counts = {
+            "warmed": 0, "researched": 0, "revalidated": 0, "served_stale": 0,
+            "failed": 0, "over_budget": 0, "deferred": 0,
+        }
+
+    def hot(self, query: str) -> bool:
+        return normalize_query(query) in self._hot
+
+    def _enqueue(self, priority: int, kind: str, query: str):
+        key = (kind, normalize_query(query))
+        with self._lock:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+        self._queue.put((priority, next(self._seq), kind, query))
+
+    def revalidate(self, kind: str, query: str):
+        """A live lookup was served a stale value; fetch a fresh one in the background."""
+        self.counts["served_stale"] += 1
+        self._enqueue(0, kind, query)
+
+    # ---- planning ----
+    def _due(self, kind: str, query: str) -> bool:
+        from tools import cache  # tools loads langchain; only the warm-up thread needs it
+        age = cache.age(kind, query)
+        ttl = cache.ttls.get(kind)
+        return age is None or (ttl is not None and age >= REFRESH_AHEAD * ttl)
+
+    def _research_due(self, query: str) -> bool:
+        from answer_cache import answer_cache
+        from router import is_research_query
+        if not is_research_query(query):
+            return False
+        margin = (1 - REFRESH_AHEAD) * answer_cache.ttl
+        cached, _ = answer_cache.lookup("research", query, margin=margin, count=False)
+        return cached is None
+
+    def plan(self):
+        """Mine the hot topics and queue whatever is missing or close to expiring."""
+        self.topics = mine()
+        self._hot = frozenset(normalize_query(q) for q, _ in self.topics)
+        self._calls = 0
+        for rank, (query, _) in enumerate(self.topics):
+            for kind in TOOL_KINDS:
+                if self._due(kind, query):
+                    self._enqueue(1, kind, query)
+            if self._research and rank < RESEARCH_TOPICS and self._research_due(query):
+                self._enqueue(2, "research", query)
+
+    # ---- running ----
+    def _busy(self, kind: str) -> bool:
+        if in_flight(exclude=("warmup",)) > MAX_LIVE:
+            return True
+        bucket = backends[BACKEND[kind]].bucket
+        return bucket.level() < RESERVE * bucket.burst
+
+    def _run_task(self, kind: str, query: str):
+        with span("warmup", kind=kind) as attrs:
+            try:
+                if kind == "research":
+                    self._research(query)
+                else:
+                    from tools import refresh
+                    refresh(kind, query)
+            except Exception as e:
+                attrs["error"] = type(e).__name__
+                self.counts["failed"] += 1
+                return
+        self.counts["researched" if kind == "research" else "warmed"] += 1
+
+    def step(self, timeout: float | None = None, patience: float = INTERVAL) -> bool:
+        """Run the next queued task once there is room for it; False if the queue stayed empty."""
+        try:
+            priority, _, kind, query = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        with self._lock:
+            self._queued.discard((kind, normalize_query(query)))
+
+        if self._calls >= MAX_CALLS:
+            self.counts["over_budget"] += 1
+            return True
+        give_up = time.monotonic() + patience
+        while self._busy(kind):
+            if time.monotonic() >= give_up or self._stop.wait(1.0):
+                self.counts["deferred"] += 1
+                return True
+
+        self._calls += 1
+        if priority == 0:
+            self.counts["revalidated"] += 1
+        self._run_task(kind, query)
+        return True
+
+    def run_once(self):
+        """One full pass in the calling thread."""
+        self.plan()
+        while self.step(timeout=0):
+            pass
+
+    def _run(self):
+        next_plan = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_plan:
+                try:
+                    self.plan()
+                except Exception as e:
+                    print(f"[warmup] planning failed: {e}", file=sys.stderr)
+                next_plan = now + INTERVAL
+            self.step(timeout=max(0.1, next_plan - time.monotonic()), patience=max(1.0, next_plan - time.monotonic()))
+
+    def start(self, research=None):
+        """Start the background thread (once); does nothing when warm-up is off.
+
+        `research(query)` runs full research past the answer cache and stores
+        the result; it is only used in research mode.
+        """
+        with self._lock:
+            if self.mode == "off" or self._thread is not None:
+                return
+            self._research = research if self.mode == "research" else None
+            self._thread = threading.Thread(target=self._run, name="qai-warmup", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+warmer = Warmer()
+
+metrics.gauges["qai_warmup_total"] = lambda: {f'outcome="{k}"': v for k, v in warmer.counts.items()}
+metrics.gauges["qai_warmup_hot_topics"] = lambda: {"": len(warmer.topics)}
+metrics.gauges["qai_warmup_queued"] = lambda: {"": warmer._queue.qsize()}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["run"]:
+        if MODE == "research":
+            from main import refresh_research
+            warmer._research = refresh_research
+        warmer.run_once()
+        print(", ".join(f"{k} {v}" for k, v in warmer.counts.items()))
+    else:
+        for query, score in mine():
+            print(f"{score:7.2f}  {query}")
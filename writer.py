@@ -0,0 +1,142 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from archive import archive
+
+# -----------------------------
+# Settings
+# -----------------------------
+TEXT_PATH = os.getenv("QAI_SAVE_PATH", "research_output.txt")
+JSONL_PATH = os.getenv("QAI_SAVE_JSONL")  # optional structured copy
+MAX_BATCH = int(os.getenv("QAI_SAVE_BATCH", "64"))
+MAX_DELAY = float(os.getenv("QAI_SAVE_DELAY", "1.0"))
+
+
+# -----------------------------
+# Sinks
+# -----------------------------
+class TextSink:
+    """The original '--- Research Output ---' block format."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, records: list[dict]):
+        self._file.write("".join(
+            f"--- Research Output ---\nTimestamp: {r['timestamp']}\n\n{r['data']}\n\n" for r in records
+        ))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, records: list[dict]):
+        self._file.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# -----------------------------
+# Background writer
+# -----------------------------
+class OutputWriter:
+    """Queues records from any thread and writes them in batches from one thread.
+
+    A batch is written when it reaches `max_batch` records or when the oldest
+    record has waited `max_delay` seconds. Each batch is a single write per
+    sink, so entries from concurrent sessions never interleave.
+    """
+
+    def __init__(self, sinks: list, max_batch: int = MAX_BATCH, max_delay: float = MAX_DELAY):
+        self.sinks = sinks
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.written = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="qai-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, data: str) -> dict:
+        if self._closed:
+            raise RuntimeError("writer is closed")
+        record = {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "data": data}
+        self._queue.put(record)
+        return record
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything queued so far is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+        for sink in self.sinks:
+            sink.close()
+
+    def _write(self, batch: list[dict]):
+        if not batch:
+            return
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception as e:
+                print(f"[writer] {type(sink).__name__} failed: {e}", file=sys.stderr)
+        self.written += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ...
+
+            if isinstance(item, dict):
+                batch.append(item)
+                deadline = deadline or time.monotonic() + self.max_delay
+                if len(batch) < self.max_batch:
+                    continue
+
+            self._write(batch)
+            batch, deadline = [], None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+
+def _default_sinks() -> list:
+    sinks = [TextSink(TEXT_PATH)]
+    if JSONL_PATH:
+        sinks.append(JsonlSink(JSONL_PATH))
+    if archive is not None:
+        sinks.append(archive)
+    return sinks
+
+
+writer = OutputWriter(_default_sinks())
+atexit.register(writer.close)